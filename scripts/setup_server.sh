@@ -12,9 +12,9 @@ sudo apt update && sudo apt upgrade -y
 # Install required packages
 echo "Installing required packages..."
 sudo apt install -y \
-    python3.9 \
-    python3.9-venv \
-    python3.9-dev \
+    python3.11 \
+    python3.11-venv \
+    python3.11-dev \
     git \
     nvidia-cuda-toolkit \
     nvidia-driver-535 \
@@ -38,7 +38,7 @@ git clone https://github.com/your-username/decentralized-ai.git .
 
 # Create virtual environment
 echo "Setting up Python virtual environment..."
-python3.9 -m venv venv
+python3.11 -m venv venv
 source venv/bin/activate
 
 # Install dependencies
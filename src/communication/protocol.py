@@ -1,6 +1,6 @@
-from typing import Dict, List, Any
+from typing import Dict, Any, Optional, Tuple
 from pydantic import BaseModel
-import json
+import orjson
 import asyncio
 from datetime import datetime
 
@@ -13,47 +13,163 @@ class Message(BaseModel):
     timestamp: datetime
     metadata: Dict[str, Any] = {}
 
+class RingQueue:
+    """Ограниченная кольцевая очередь сообщений (MPSC)
+
+    Предварительно выделенный буфер фиксированного размера с индексами
+    головы и хвоста: put/get выполняются за O(1) без аллокаций на сообщение,
+    а ограничение размера создаёт обратное давление на производителей.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self._maxsize = maxsize
+        self._buffer: list = [None] * maxsize
+        self._head = 0
+        self._tail = 0
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def __len__(self) -> int:
+        return self._tail - self._head
+
+    def full(self) -> bool:
+        return self._tail - self._head >= self._maxsize
+
+    def empty(self) -> bool:
+        return self._head == self._tail
+
+    async def put(self, item: Any) -> None:
+        """Добавление элемента с ожиданием свободного слота"""
+        while self.full():
+            self._not_full.clear()
+            await self._not_full.wait()
+        self._buffer[self._tail % self._maxsize] = item
+        self._tail += 1
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        """Извлечение элемента с ожиданием появления данных"""
+        while self.empty():
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        slot = self._head % self._maxsize
+        item = self._buffer[slot]
+        self._buffer[slot] = None
+        self._head += 1
+        self._not_full.set()
+        return item
+
+    def task_done(self) -> None:
+        """Совместимость с интерфейсом asyncio.Queue"""
+        pass
+
 class CommunicationProtocol:
     """Протокол коммуникации между узлами"""
-    
-    def __init__(self):
-        self.message_queue: asyncio.Queue = asyncio.Queue()
-        self.subscribers: Dict[str, List[callable]] = {}
-    
+
+    def __init__(self, queue_size: int = 4096,
+                 send_batch_enabled: bool = False,
+                 batch_size: int = 100,
+                 flush_interval: float = 0.05):
+        self.message_queue: RingQueue = RingQueue(maxsize=queue_size)
+        self.subscribers: Dict[str, Tuple[callable, ...]] = {}
+        self.send_batch_enabled = send_batch_enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: list = []
+        self._flush_event = asyncio.Event()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+
     async def send_message(self, message: Message) -> None:
         """Отправка сообщения"""
-        await self.message_queue.put(message)
-        if message.target_id in self.subscribers:
-            for callback in self.subscribers[message.target_id]:
-                await callback(message)
-    
+        if not self.send_batch_enabled:
+            await self.message_queue.put(message)
+            return
+        if self._flusher_task is None:
+            self._flusher_task = asyncio.create_task(self._batch_flusher())
+        self._pending.append(message)
+        if len(self._pending) >= self.batch_size:
+            self._flush_event.set()
+
+    async def _batch_flusher(self) -> None:
+        """Фоновая задача, сбрасывающая накопленные сообщения в очередь
+
+        Просыпается либо по таймеру flush_interval, либо раньше — когда
+        накопилось batch_size сообщений, амортизируя планирование
+        event loop по всему пакету.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(), self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        """Сброс накопленных сообщений в очередь одним пакетом"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        for message in batch:
+            await self.message_queue.put(message)
+
     async def subscribe(self, node_id: str, callback: callable) -> None:
         """Подписка на сообщения"""
-        if node_id not in self.subscribers:
-            self.subscribers[node_id] = []
-        self.subscribers[node_id].append(callback)
-    
+        current = self.subscribers.get(node_id, ())
+        self.subscribers[node_id] = current + (callback,)
+
     async def unsubscribe(self, node_id: str, callback: callable) -> None:
         """Отписка от сообщений"""
         if node_id in self.subscribers:
-            self.subscribers[node_id].remove(callback)
-    
+            self.subscribers[node_id] = tuple(
+                cb for cb in self.subscribers[node_id] if cb != callback
+            )
+
+    async def close(self) -> None:
+        """Остановка обработки сообщений"""
+        self._stop.set()
+        if self._flusher_task is not None:
+            self._flusher_task.cancel()
+            self._flusher_task = None
+
     async def process_messages(self) -> None:
         """Обработка сообщений в очереди"""
-        while True:
-            message = await self.message_queue.get()
+        while not self._stop.is_set():
+            get_task = asyncio.create_task(self.message_queue.get())
+            stop_task = asyncio.create_task(self._stop.wait())
+            done, pending = await asyncio.wait(
+                {get_task, stop_task},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            if get_task not in done:
+                return
+            message = get_task.result()
             try:
-                # Здесь будет реализована логика обработки сообщений
-                print(f"Processing message from {message.source_id} to {message.target_id}")
+                subscribers = self.subscribers.get(message.target_id)
+                if subscribers:
+                    # Единственный подписчик — без накладных расходов gather
+                    if len(subscribers) == 1:
+                        await subscribers[0](message)
+                    else:
+                        await asyncio.gather(
+                            *[callback(message) for callback in subscribers],
+                            return_exceptions=True
+                        )
             except Exception as e:
                 print(f"Error processing message: {e}")
             finally:
                 self.message_queue.task_done()
-    
+
     def serialize_message(self, message: Message) -> str:
         """Сериализация сообщения"""
-        return json.dumps(message.dict())
-    
+        return orjson.dumps(message.dict()).decode()
+
     def deserialize_message(self, message_str: str) -> Message:
         """Десериализация сообщения"""
-        return Message.parse_raw(message_str) 
\ No newline at end of file
+        return Message(**orjson.loads(message_str))
@@ -1,13 +1,50 @@
+import aiofiles
 import asyncio
+import atexit
 import logging
-from typing import Dict, List, Optional
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
 from datetime import datetime
 import psutil
 import GPUtil
+
+# Прямая привязка к NVML: GPUtil форкает nvidia-smi на каждый опрос,
+# тогда как NVML-вызов стоит микросекунды
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
 from pathlib import Path
-import json
+import orjson
+import os
 import yaml
 
+# C-ускоренный загрузчик libyaml, если собран; иначе чистый Python
+try:
+    _YamlLoader = yaml.CSafeLoader
+except AttributeError:
+    _YamlLoader = yaml.SafeLoader
+
+# Кэш распарсенных конфигов, общий для всех экземпляров:
+# {путь: (mtime_ns, конфиг)} — повторные загрузки не парсят YAML заново
+_config_cache: Dict[str, tuple] = {}
+
+
+def load_yaml_config(config_path: str) -> dict:
+    """Загрузка YAML-конфигурации с кэшированием по mtime файла"""
+    mtime = os.stat(config_path).st_mtime_ns
+    cached = _config_cache.get(config_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    # Читаем файл одним системным вызовом, а не чанками внутри загрузчика
+    with open(config_path, 'r') as f:
+        config = yaml.load(f.read(), Loader=_YamlLoader)
+    _config_cache[config_path] = (mtime, config)
+    return config
+
+
 class AutoScaler:
     """Система автоматического масштабирования"""
     
@@ -17,7 +54,8 @@ class AutoScaler:
         min_nodes: int = 2,
         max_nodes: int = 10,
         scale_up_threshold: float = 0.8,
-        scale_down_threshold: float = 0.3
+        scale_down_threshold: float = 0.3,
+        metrics_cache_ttl: float = 1.0
     ):
         self.config_path = config_path
         self.config = self._load_config()
@@ -30,50 +68,98 @@ class AutoScaler:
         self.scale_down_threshold = scale_down_threshold
         
         # Состояние системы
-        self.node_metrics: Dict[str, List[float]] = {}
+        self.node_metrics: Dict[str, Deque[float]] = {}
         self.scaling_history: List[Dict] = []
+
+        # Инкрементальная сумма текущих нагрузок узлов:
+        # позволяет проверять среднюю нагрузку за O(1) вместо обхода всех узлов
+        self._last_load: Dict[str, float] = {}
+        self._load_sum: float = 0.0
         
+        # Инициализируем NVML один раз и кэшируем дескрипторы устройств
+        self._gpu_handles: List = []
+        if pynvml is not None:
+            try:
+                pynvml.nvmlInit()
+                atexit.register(pynvml.nvmlShutdown)
+                self._gpu_handles = [
+                    pynvml.nvmlDeviceGetHandleByIndex(i)
+                    for i in range(pynvml.nvmlDeviceGetCount())
+                ]
+            except Exception:
+                self._gpu_handles = []
+
+        # Кэш системных метрик: один снимок на тик мониторинга,
+        # чтобы не опрашивать psutil/GPUtil отдельно для каждого узла
+        self.metrics_cache_ttl = metrics_cache_ttl
+        self._metrics_cache: Optional[Dict[str, float]] = None
+        self._metrics_cache_at: float = 0.0
+
         # Создаем директорию для метрик
         self.metrics_dir = Path("metrics")
         self.metrics_dir.mkdir(exist_ok=True)
+
+        # Журнал метрик: дельты пишутся каждый тик, полный снимок — реже
+        self._snapshot_every = 60
+        self._tick_count = 0
+        self._saved_history_len = 0
     
     def _load_config(self) -> dict:
         """Загрузка конфигурации"""
-        with open(self.config_path, 'r') as f:
-            return yaml.safe_load(f)
+        return load_yaml_config(self.config_path)
     
     async def get_system_metrics(self) -> Dict[str, float]:
         """Получение метрик системы"""
+        now = time.monotonic()
+        if (
+            self._metrics_cache is not None
+            and now - self._metrics_cache_at < self.metrics_cache_ttl
+        ):
+            return self._metrics_cache
+
         metrics = {
-            "cpu_usage": psutil.cpu_percent() / 100,
+            "cpu_usage": psutil.cpu_percent(interval=None) / 100,
             "memory_usage": psutil.virtual_memory().percent / 100,
             "disk_usage": psutil.disk_usage('/').percent / 100
         }
         
         try:
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                metrics["gpu_usage"] = gpus[0].load
-                metrics["gpu_memory"] = gpus[0].memoryUtil
+            if self._gpu_handles:
+                handle = self._gpu_handles[0]
+                utilization = pynvml.nvmlDeviceGetUtilizationRates(handle)
+                memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                metrics["gpu_usage"] = utilization.gpu / 100
+                metrics["gpu_memory"] = memory.used / memory.total
+            else:
+                gpus = GPUtil.getGPUs()
+                if gpus:
+                    metrics["gpu_usage"] = gpus[0].load
+                    metrics["gpu_memory"] = gpus[0].memoryUtil
         except Exception as e:
             self.logger.warning(f"Не удалось получить метрики GPU: {e}")
-        
+
+        self._metrics_cache = metrics
+        self._metrics_cache_at = now
         return metrics
-    
-    async def get_node_metrics(self, node_id: str) -> Dict[str, float]:
+
+    async def get_node_metrics(
+        self,
+        node_id: str,
+        snapshot: Optional[Dict[str, float]] = None
+    ) -> Dict[str, float]:
         """Получение метрик узла"""
         if node_id not in self.node_metrics:
-            self.node_metrics[node_id] = []
-        
-        metrics = await self.get_system_metrics()
-        self.node_metrics[node_id].append(
-            sum(metrics.values()) / len(metrics)
-        )
-        
-        # Ограничиваем историю
-        if len(self.node_metrics[node_id]) > 100:
-            self.node_metrics[node_id] = self.node_metrics[node_id][-100:]
-        
+            self.node_metrics[node_id] = deque(maxlen=100)
+
+        metrics = snapshot if snapshot is not None else await self.get_system_metrics()
+        load = sum(metrics.values()) / len(metrics)
+        # maxlen автоматически вытесняет старые значения без копирования
+        self.node_metrics[node_id].append(load)
+
+        # Обновляем инкрементальную сумму нагрузок
+        self._load_sum += load - self._last_load.get(node_id, 0.0)
+        self._last_load[node_id] = load
+
         return metrics
     
     async def should_scale_up(self) -> bool:
@@ -81,14 +167,9 @@ class AutoScaler:
         current_nodes = len(self.node_metrics)
         if current_nodes >= self.max_nodes:
             return False
-        
-        # Проверяем среднюю нагрузку всех узлов
-        total_load = 0
-        for metrics in self.node_metrics.values():
-            if metrics:
-                total_load += metrics[-1]
-        
-        avg_load = total_load / current_nodes if current_nodes > 0 else 0
+
+        # Средняя нагрузка из инкрементальной суммы — O(1)
+        avg_load = self._load_sum / current_nodes if current_nodes > 0 else 0
         return avg_load > self.scale_up_threshold
     
     async def should_scale_down(self) -> bool:
@@ -96,17 +177,12 @@ class AutoScaler:
         current_nodes = len(self.node_metrics)
         if current_nodes <= self.min_nodes:
             return False
-        
-        # Проверяем среднюю нагрузку всех узлов
-        total_load = 0
-        for metrics in self.node_metrics.values():
-            if metrics:
-                total_load += metrics[-1]
-        
-        avg_load = total_load / current_nodes if current_nodes > 0 else 0
+
+        # Средняя нагрузка из инкрементальной суммы — O(1)
+        avg_load = self._load_sum / current_nodes if current_nodes > 0 else 0
         return avg_load < self.scale_down_threshold
     
-    async def scale_up(self) -> bool:
+    async def scale_up(self, timestamp: Optional[str] = None) -> bool:
         """Масштабирование вверх"""
         current_nodes = len(self.node_metrics)
         if current_nodes >= self.max_nodes:
@@ -115,11 +191,11 @@ class AutoScaler:
         try:
             # Создаем новый узел
             new_node_id = f"node{current_nodes + 1}"
-            self.node_metrics[new_node_id] = []
+            self.node_metrics[new_node_id] = deque(maxlen=100)
             
             # Записываем историю масштабирования
             self.scaling_history.append({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp or datetime.now().isoformat(),
                 "action": "scale_up",
                 "node_id": new_node_id,
                 "reason": "high_load"
@@ -132,7 +208,7 @@ class AutoScaler:
             self.logger.error(f"Ошибка масштабирования вверх: {e}")
             return False
     
-    async def scale_down(self) -> bool:
+    async def scale_down(self, timestamp: Optional[str] = None) -> bool:
         """Масштабирование вниз"""
         current_nodes = len(self.node_metrics)
         if current_nodes <= self.min_nodes:
@@ -145,12 +221,13 @@ class AutoScaler:
                 key=lambda x: x[1][-1] if x[1] else float('inf')
             )[0]
             
-            # Удаляем узел
+            # Удаляем узел и его вклад в сумму нагрузок
             del self.node_metrics[min_load_node]
+            self._load_sum -= self._last_load.pop(min_load_node, 0.0)
             
             # Записываем историю масштабирования
             self.scaling_history.append({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp or datetime.now().isoformat(),
                 "action": "scale_down",
                 "node_id": min_load_node,
                 "reason": "low_load"
@@ -164,29 +241,58 @@ class AutoScaler:
             return False
     
     async def save_metrics(self):
-        """Сохранение метрик"""
+        """Сохранение метрик
+
+        Каждый тик в append-only журнал дописываются только новые данные;
+        полный снимок состояния пишется раз в _snapshot_every тиков в
+        рабочем потоке, чтобы не блокировать event loop.
+        """
+        self._tick_count += 1
+
+        tick_delta = {
+            "timestamp": datetime.now().isoformat(),
+            "loads": dict(self._last_load),
+            "events": self.scaling_history[self._saved_history_len:]
+        }
+        self._saved_history_len = len(self.scaling_history)
+
+        async with aiofiles.open(self.metrics_dir / "events.ndjson", "ab") as f:
+            await f.write(orjson.dumps(tick_delta) + b"\n")
+
+        if self._tick_count % self._snapshot_every == 0:
+            await asyncio.to_thread(self._write_snapshot)
+
+    def _write_snapshot(self):
+        """Полный снимок метрик с атомарной заменой файла"""
         metrics_file = self.metrics_dir / "scaling_metrics.json"
         data = {
-            "node_metrics": self.node_metrics,
+            "node_metrics": {
+                node_id: list(history)
+                for node_id, history in self.node_metrics.items()
+            },
             "scaling_history": self.scaling_history
         }
-        
-        with open(metrics_file, 'w') as f:
-            json.dump(data, f, indent=2)
+
+        tmp_file = metrics_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, metrics_file)
     
     async def start_monitoring(self, check_interval: int = 60):
         """Запуск мониторинга и масштабирования"""
         while True:
             try:
-                # Обновляем метрики всех узлов
+                # Один системный снимок и одна временная метка на тик
+                snapshot = await self.get_system_metrics()
+                tick_timestamp = datetime.now().isoformat()
                 for node_id in list(self.node_metrics.keys()):
-                    await self.get_node_metrics(node_id)
-                
+                    await self.get_node_metrics(node_id, snapshot)
+
                 # Проверяем необходимость масштабирования
                 if await self.should_scale_up():
-                    await self.scale_up()
+                    await self.scale_up(tick_timestamp)
                 elif await self.should_scale_down():
-                    await self.scale_down()
+                    await self.scale_down(tick_timestamp)
                 
                 # Сохраняем метрики
                 await self.save_metrics()
@@ -4,10 +4,59 @@ from pathlib import Path
 import json
 from datetime import datetime
 import asyncio
+import concurrent.futures
 import pytest
 import coverage
+from coverage.python import PythonFileReporter
 import ast
-import random
+import py_compile
+import numpy as np
+
+class _TestCollector(ast.NodeVisitor):
+    """Однопроходный сборщик целей тестирования
+
+    Классифицирует узлы за один обход дерева: функции уровня модуля и
+    методы классов. В тела классов и функций не спускается, поэтому
+    методы не порождают дублирующих тестов по функциональной ветке.
+    """
+
+    def __init__(self, system: "AutoTestingSystem"):
+        self._system = system
+        self.tests: List[Dict[str, Any]] = []
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self.tests.append(self._system._build_test(
+            f"test_{node.name}", "function", node.name, node
+        ))
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for method in node.body:
+            if isinstance(method, ast.FunctionDef):
+                self.tests.append(self._system._build_test(
+                    f"test_{node.name}_{method.name}",
+                    "method",
+                    f"{node.name}.{method.name}",
+                    method
+                ))
+
+class _ResultPlugin:
+    """Плагин pytest, собирающий исход каждого теста за один запуск"""
+
+    def __init__(self):
+        self.outcomes: List[tuple] = []
+
+    def pytest_runtest_logreport(self, report) -> None:
+        if report.when == "call" or (report.when == "setup" and report.failed):
+            self.outcomes.append((report.nodeid, report.outcome))
+
+def _parse_and_generate(path: str) -> List[Dict[str, Any]]:
+    """Воркер пула процессов: чтение, парсинг и генерация тестов для файла"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    collector = _TestCollector(AutoTestingSystem(Path(path).parent))
+    collector.visit(ast.parse(content))
+    return collector.tests
 
 class AutoTestingSystem:
     def __init__(self, system_root: Path):
@@ -15,79 +64,59 @@ class AutoTestingSystem:
         self.logger = logging.getLogger(__name__)
         self.test_history = []
         self.coverage_history = []
-        
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+        # Пулы случайных значений: генерируются пакетно через numpy,
+        # выдача одного значения — это индексация списка вместо
+        # отдельного вызова Mersenne Twister на каждый аргумент
+        self._rng = np.random.default_rng()
+        self._value_pools: Dict[str, List[Any]] = {}
+        self._pool_cursors: Dict[str, int] = {}
+
     async def generate_tests(self) -> List[Dict[str, Any]]:
-        """Генерация тестов на основе анализа кода"""
-        tests = []
-        
-        # Анализируем все Python файлы
-        for file_path in self.system_root.rglob("*.py"):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    
-                # Анализируем код
-                tree = ast.parse(content)
-                
-                # Генерируем тесты для функций
-                function_tests = self._generate_function_tests(tree)
-                
-                # Генерируем тесты для классов
-                class_tests = self._generate_class_tests(tree)
-                
-                tests.extend(function_tests)
-                tests.extend(class_tests)
-                
-            except Exception as e:
-                self.logger.error(f"Ошибка генерации тестов для {file_path}: {e}")
-                
-        return tests
-    
-    def _generate_function_tests(self, tree: ast.AST) -> List[Dict[str, Any]]:
-        """Генерация тестов для функций"""
-        tests = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                # Генерируем тестовые данные
-                test_data = self._generate_test_data(node)
-                
-                # Создаем тест
-                test = {
-                    "name": f"test_{node.name}",
-                    "type": "function",
-                    "target": node.name,
-                    "data": test_data,
-                    "expected": self._generate_expected_result(node)
-                }
-                
-                tests.append(test)
-                
-        return tests
-    
-    def _generate_class_tests(self, tree: ast.AST) -> List[Dict[str, Any]]:
-        """Генерация тестов для классов"""
+        """Генерация тестов на основе анализа кода
+
+        Чтение и парсинг файлов — блокирующая CPU-работа, поэтому каждый
+        файл обрабатывается в пуле процессов, а event loop не простаивает.
+        """
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor()
+
+        loop = asyncio.get_running_loop()
+        file_paths = list(self.system_root.rglob("*.py"))
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(self._pool, _parse_and_generate, str(p))
+                for p in file_paths
+            ),
+            return_exceptions=True
+        )
+
         tests = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                # Генерируем тесты для методов
-                for method in node.body:
-                    if isinstance(method, ast.FunctionDef):
-                        test_data = self._generate_test_data(method)
-                        
-                        test = {
-                            "name": f"test_{node.name}_{method.name}",
-                            "type": "method",
-                            "target": f"{node.name}.{method.name}",
-                            "data": test_data,
-                            "expected": self._generate_expected_result(method)
-                        }
-                        
-                        tests.append(test)
-                        
+        for file_path, result in zip(file_paths, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Ошибка генерации тестов для {file_path}: {result}")
+            else:
+                tests.extend(result)
+
         return tests
     
+    def _build_test(
+        self,
+        name: str,
+        test_type: str,
+        target: str,
+        node: ast.FunctionDef
+    ) -> Dict[str, Any]:
+        """Построение описания теста для функции или метода"""
+        return {
+            "name": name,
+            "type": test_type,
+            "target": target,
+            "data": self._generate_test_data(node),
+            "expected": self._generate_expected_result(node)
+        }
+
     def _generate_test_data(self, node: ast.FunctionDef) -> Dict[str, Any]:
         """Генерация тестовых данных"""
         test_data = {}
@@ -102,40 +131,69 @@ class AutoTestingSystem:
                 
         return test_data
     
+    _POOL_SIZE = 4096
+
+    def _next_random(self, kind: str) -> Any:
+        """Выдача очередного значения из пакетно сгенерированного пула"""
+        pool = self._value_pools.get(kind)
+        cursor = self._pool_cursors.get(kind, 0)
+        if pool is None or cursor >= len(pool):
+            pool = self._refill_pool(kind)
+            cursor = 0
+        self._pool_cursors[kind] = cursor + 1
+        return pool[cursor]
+
+    def _refill_pool(self, kind: str) -> List[Any]:
+        """Пакетная генерация пула значений указанного типа"""
+        if kind == "int":
+            pool = self._rng.integers(-100, 101, size=self._POOL_SIZE).tolist()
+        elif kind == "float":
+            pool = self._rng.uniform(-100, 100, size=self._POOL_SIZE).tolist()
+        elif kind == "str":
+            pool = [
+                f"test_{n}"
+                for n in self._rng.integers(1, 1001, size=self._POOL_SIZE).tolist()
+            ]
+        elif kind == "bool":
+            pool = (self._rng.integers(0, 2, size=self._POOL_SIZE) == 1).tolist()
+        else:  # индексы типов для _generate_random_value
+            pool = self._rng.integers(0, 6, size=self._POOL_SIZE).tolist()
+        self._value_pools[kind] = pool
+        return pool
+
     def _generate_value_by_type(self, type_node: ast.AST) -> Any:
         """Генерация значения по типу"""
         if isinstance(type_node, ast.Name):
             if type_node.id == "int":
-                return random.randint(-100, 100)
+                return self._next_random("int")
             elif type_node.id == "float":
-                return random.uniform(-100, 100)
+                return self._next_random("float")
             elif type_node.id == "str":
-                return f"test_{random.randint(1, 1000)}"
+                return self._next_random("str")
             elif type_node.id == "bool":
-                return random.choice([True, False])
+                return self._next_random("bool")
             elif type_node.id == "list":
                 return []
             elif type_node.id == "dict":
                 return {}
-                
+
         return None
-    
+
     def _generate_random_value(self) -> Any:
         """Генерация случайного значения"""
-        types = [int, float, str, bool, list, dict]
-        value_type = random.choice(types)
-        
-        if value_type == int:
-            return random.randint(-100, 100)
-        elif value_type == float:
-            return random.uniform(-100, 100)
-        elif value_type == str:
-            return f"test_{random.randint(1, 1000)}"
-        elif value_type == bool:
-            return random.choice([True, False])
-        elif value_type == list:
+        type_index = self._next_random("type")
+
+        if type_index == 0:
+            return self._next_random("int")
+        elif type_index == 1:
+            return self._next_random("float")
+        elif type_index == 2:
+            return self._next_random("str")
+        elif type_index == 3:
+            return self._next_random("bool")
+        elif type_index == 4:
             return []
-        elif value_type == dict:
+        else:
             return {}
             
     def _generate_expected_result(self, node: ast.FunctionDef) -> Any:
@@ -158,39 +216,49 @@ class AutoTestingSystem:
             "details": []
         }
         
+        # Одна временная метка на весь прогон: детали одного запуска
+        # не нуждаются в индивидуальных вызовах datetime.now()
+        timestamp = datetime.now().isoformat()
+
         # Запускаем тесты с измерением покрытия
         cov = coverage.Coverage()
         cov.start()
-        
+
+        # Сначала создаем все тестовые файлы
+        test_files = []
         for test in tests:
             try:
-                # Создаем тестовый файл
-                test_file = self._create_test_file(test)
-                
-                # Запускаем тест
-                result = pytest.main(["-v", str(test_file)])
-                
-                # Анализируем результат
-                if result == 0:
-                    results["passed"] += 1
-                else:
-                    results["failed"] += 1
-                    
-                results["details"].append({
-                    "name": test["name"],
-                    "status": "passed" if result == 0 else "failed",
-                    "timestamp": datetime.now().isoformat()
-                })
-                
+                test_files.append(self._create_test_file(test))
             except Exception as e:
                 results["errors"] += 1
                 results["details"].append({
                     "name": test["name"],
                     "status": "error",
                     "error": str(e),
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": timestamp
                 })
-                
+
+        # Один вызов pytest на весь пакет: плагины, conftest и сбор
+        # инициализируются единожды, а не для каждого теста
+        plugin = _ResultPlugin()
+        if test_files:
+            pytest.main(
+                ["-q", "--tb=short", "-p", "no:cacheprovider"]
+                + [str(f) for f in test_files],
+                plugins=[plugin]
+            )
+
+        for nodeid, outcome in plugin.outcomes:
+            if outcome == "passed":
+                results["passed"] += 1
+            else:
+                results["failed"] += 1
+            results["details"].append({
+                "name": nodeid.rsplit("::", 1)[-1],
+                "status": "passed" if outcome == "passed" else "failed",
+                "timestamp": timestamp
+            })
+
         # Останавливаем измерение покрытия
         cov.stop()
         cov.save()
@@ -216,20 +284,29 @@ class AutoTestingSystem:
         
         with open(test_file, "w", encoding="utf-8") as f:
             f.write(self._generate_test_code(test))
-            
+
+        # Прекомпилируем байткод, чтобы pytest взял готовый .pyc
+        # и не парсил сгенерированный файл заново при сборе
+        try:
+            py_compile.compile(str(test_file), doraise=True)
+        except py_compile.PyCompileError as e:
+            self.logger.warning(f"Не удалось прекомпилировать {test_file}: {e}")
+
         return test_file
-    
+
     def _generate_test_code(self, test: Dict[str, Any]) -> str:
         """Генерация кода теста"""
+        # repr корректно экранирует строковые литералы в данных —
+        # f-подстановка значения напрямую ломала синтаксис на кавычках
         code = f"""
 def {test['name']}():
     # Подготовка тестовых данных
-    test_data = {test['data']}
-    expected = {test['expected']}
-    
+    test_data = {test['data']!r}
+    expected = {test['expected']!r}
+
     # Вызов тестируемой функции
     result = {test['target']}(**test_data)
-    
+
     # Проверка результата
     assert result == expected
 """
@@ -244,12 +321,17 @@ def {test['name']}():
             "coverage_percentage": 0
         }
         
-        # Анализируем отчет
-        for filename in cov.get_data().measured_files():
-            analysis = cov.analysis2(filename)
-            report["total_lines"] += analysis[1]
-            report["covered_lines"] += analysis[1] - len(analysis[2])
-            report["missing_lines"] += len(analysis[2])
+        # Анализируем отчет по уже собранным данным: analysis2 заново
+        # токенизировал бы каждый исходник при каждом обращении
+        data = cov.get_data()
+        for filename in data.measured_files():
+            reporter = PythonFileReporter(filename, cov)
+            statements = reporter.lines()
+            executed = data.lines(filename) or []
+            missing = statements - set(executed)
+            report["total_lines"] += len(statements)
+            report["covered_lines"] += len(statements) - len(missing)
+            report["missing_lines"] += len(missing)
             
         if report["total_lines"] > 0:
             report["coverage_percentage"] = (
@@ -2,18 +2,211 @@ from typing import Dict, List, Any, Optional
 import logging
 from pathlib import Path
 import ast
+import hashlib
+import mmap
+import orjson
+import os
+import pickle
 import re
+import shutil
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import aiohttp
 import asyncio
 
+# BLAKE3 в несколько раз быстрее SHA-256 на контент-адресации;
+# криптографическая стойкость кэшу не нужна, поэтому падение
+# обратно на SHA-256 безопасно
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+class _AnalyzerVisitor(ast.NodeVisitor):
+    """Однопроходный анализатор файла
+
+    Собирает сложность, паттерны, зависимости и потенциальные улучшения
+    за один обход дерева вместо четырёх отдельных ast.walk. Диспетчеризация
+    по типу узла идет через таблицу методов visit_* (один поиск в словаре
+    на узел), а не через последовательные isinstance-проверки с
+    пересозданием кортежа типов на каждой итерации.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.complexity = 0
+        self.patterns: List[str] = []
+        self.dependencies: List[str] = []
+        self.improvements: List[Dict[str, Any]] = []
+
+    def _visit_branch(self, node: ast.AST) -> None:
+        self.complexity += 1
+        self.generic_visit(node)
+
+    visit_While = _visit_branch
+    visit_For = _visit_branch
+    visit_AsyncFor = _visit_branch
+    visit_ExceptHandler = _visit_branch
+
+    def visit_If(self, node: ast.If) -> None:
+        self.complexity += 1
+        if len(node.body) > 10:
+            self.improvements.append({
+                "type": "condition_complexity",
+                "file": self.file_path,
+                "line": node.lineno,
+                "description": "Сложное условие",
+                "suggestion": "Упростить условие или разбить на части"
+            })
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        if len(node.body) > 20:
+            self.improvements.append({
+                "type": "function_length",
+                "file": self.file_path,
+                "line": node.lineno,
+                "description": f"Функция {node.name} слишком длинная ({len(node.body)} строк)",
+                "suggestion": "Разбить на более мелкие функции"
+            })
+        self.generic_visit(node)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        # Проверяем наследование
+        if len(node.bases) > 0:
+            self.patterns.append("inheritance")
+
+        # Проверяем декораторы; isinstance-защита — декоратор может быть
+        # атрибутом вида module.abstractmethod без поля .id
+        if any(
+            isinstance(d, ast.Name) and d.id == "abstractmethod"
+            for d in node.decorator_list
+        ):
+            self.patterns.append("abstract_class")
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        self.dependencies.extend(alias.name for alias in node.names)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        self.dependencies.append(node.module)
+
+def _parse_source(content_bytes: bytes, filename: str) -> ast.AST:
+    """Построение AST для анализа
+
+    Единая точка парсинга: bytes уходят в компилятор напрямую (без
+    decode), type-комментарии не собираются, и сюда же подключается
+    альтернативный бэкенд (tree-sitter), если он появится в зависимостях.
+    """
+    return compile(
+        content_bytes,
+        filename,
+        "exec",
+        flags=ast.PyCF_ONLY_AST,
+        dont_inherit=True
+    )
+
+def _analyze_one_file(path: str) -> Dict[str, Any]:
+    """Воркер пула процессов: парсинг и полный анализ одного файла"""
+    try:
+        with open(path, "rb") as f:
+            content_bytes = f.read()
+        tree = _parse_source(content_bytes, path)
+        visitor = _AnalyzerVisitor(path)
+        visitor.visit(tree)
+        return {
+            "complexity": visitor.complexity,
+            "patterns": visitor.patterns,
+            "dependencies": visitor.dependencies,
+            "improvements": visitor.improvements
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
 class CodeAnalysisSystem:
     def __init__(self, system_root: Path):
         self.system_root = system_root
         self.logger = logging.getLogger(__name__)
-        self.analysis_history = []
+        # Ограниченная история: каждый снимок держит результаты по всему
+        # дереву, неограниченный список — утечка памяти на длинной сессии
+        self.analysis_history = deque(maxlen=100)
         self.code_cache = {}
-        
+
+        # Персистентный кэш результатов анализа: ключ — SHA-256
+        # содержимого файла, неизменённые файлы не парсятся заново
+        self.cache_dir = system_root / ".ast_cache"
+
+        # Манифест path -> [mtime_ns, size, content_hash]: совпадение
+        # mtime и размера позволяет не читать и не хэшировать файл вовсе
+        self._manifest: Optional[Dict[str, List]] = None
+
+        # Кэш ответов GitHub: query -> (ETag, результаты); 304-ответы
+        # не тратят лимит поискового API. LRU с верхней границей —
+        # память не растет с числом уникальных запросов
+        self._github_etags: "OrderedDict[str, tuple]" = OrderedDict()
+        self._github_etags_max = 256
+        self._github_session: Optional[aiohttp.ClientSession] = None
+        self._rate_limit_reset: float = 0.0
+
+    _HASH_CHUNK_SIZE = 1 << 20
+
+    def _hash_file(self, path: Path) -> str:
+        """Потоковое хэширование файла фиксированными чанками
+
+        Содержимое не материализуется в памяти целиком — пиковый RSS
+        не зависит от размера самого большого файла в дереве.
+        """
+        hasher = blake3.blake3() if blake3 is not None else hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self._HASH_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        hasher.update(f"py{sys.version_info[0]}.{sys.version_info[1]}".encode())
+        if blake3 is not None:
+            return hasher.hexdigest(length=16)
+        return hasher.hexdigest()
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key[2:]}.pkl"
+
+    def _load_manifest(self) -> Dict[str, List]:
+        """Ленивая загрузка манифеста кэша"""
+        if self._manifest is None:
+            try:
+                with open(self.cache_dir / "manifest.json", "rb") as f:
+                    self._manifest = orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                self._manifest = {}
+        return self._manifest
+
+    def _save_manifest(self) -> None:
+        """Атомарное сохранение манифеста кэша"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.cache_dir / "manifest.json"
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(self._manifest))
+        os.replace(tmp_path, manifest_path)
+
+    def _load_cached_analysis(self, key: str) -> Optional[Dict[str, Any]]:
+        """Чтение результата анализа из кэша"""
+        try:
+            with open(self._cache_path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _store_cached_analysis(self, key: str, result: Dict[str, Any]) -> None:
+        """Атомарная запись результата анализа в кэш"""
+        cache_path = self._cache_path(key)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
     async def analyze_code(self) -> Dict[str, Any]:
         """Анализ кодовой базы"""
         analysis = {
@@ -23,32 +216,60 @@ class CodeAnalysisSystem:
             "potential_improvements": []
         }
         
-        # Анализируем все Python файлы
+        # Сначала закрываем попадания в кэш — дешёвым файлам незачем
+        # платить за межпроцессную сериализацию
+        manifest = self._load_manifest()
+        manifest_dirty = False
+
+        cache_misses: List[tuple] = []
         for file_path in self.system_root.rglob("*.py"):
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    
-                # Анализируем сложность
-                tree = ast.parse(content)
-                complexity = self._calculate_complexity(tree)
-                
-                # Анализируем паттерны
-                patterns = self._analyze_patterns(tree)
-                
-                # Анализируем зависимости
-                dependencies = self._analyze_dependencies(tree)
-                
-                analysis["complexity"][str(file_path)] = complexity
-                analysis["patterns"][str(file_path)] = patterns
-                analysis["dependencies"][str(file_path)] = dependencies
-                
-                # Ищем потенциальные улучшения
-                improvements = self._find_improvements(file_path, content)
-                analysis["potential_improvements"].extend(improvements)
-                
+                # Быстрый путь: mtime и размер не изменились —
+                # берем хэш из манифеста без чтения файла
+                path_str = str(file_path)
+                stat = os.stat(file_path)
+                entry = manifest.get(path_str)
+                if (
+                    entry is not None
+                    and entry[0] == stat.st_mtime_ns
+                    and entry[1] == stat.st_size
+                ):
+                    key = entry[2]
+                else:
+                    key = self._hash_file(file_path)
+                    manifest[path_str] = [stat.st_mtime_ns, stat.st_size, key]
+                    manifest_dirty = True
+
+                file_result = self._load_cached_analysis(key)
+
+                if file_result is None:
+                    cache_misses.append((file_path, key))
+                else:
+                    self._merge_file_result(analysis, file_path, file_result)
+
             except Exception as e:
                 self.logger.error(f"Ошибка анализа файла {file_path}: {e}")
+
+        # Промахи анализируем параллельно: парсинг CPU-bound и
+        # масштабируется по ядрам только в пуле процессов
+        if cache_misses:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                results = executor.map(
+                    _analyze_one_file,
+                    [str(path) for path, _ in cache_misses],
+                    chunksize=16
+                )
+                for (file_path, key), file_result in zip(cache_misses, results):
+                    if "error" in file_result:
+                        self.logger.error(
+                            f"Ошибка анализа файла {file_path}: {file_result['error']}"
+                        )
+                        continue
+                    self._store_cached_analysis(key, file_result)
+                    self._merge_file_result(analysis, file_path, file_result)
+
+        if manifest_dirty:
+            self._save_manifest()
                 
         # Сохраняем историю анализа
         self.analysis_history.append({
@@ -57,120 +278,146 @@ class CodeAnalysisSystem:
         })
         
         return analysis
-        
-    def _calculate_complexity(self, tree: ast.AST) -> int:
-        """Расчет цикломатической сложности"""
-        complexity = 0
-        
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.If, ast.While, ast.For, ast.AsyncFor)):
-                complexity += 1
-            elif isinstance(node, ast.ExceptHandler):
-                complexity += 1
-                
-        return complexity
-        
-    def _analyze_patterns(self, tree: ast.AST) -> List[str]:
-        """Анализ паттернов проектирования"""
-        patterns = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                # Проверяем наследование
-                if len(node.bases) > 0:
-                    patterns.append("inheritance")
-                    
-                # Проверяем декораторы
-                if any(d.id == "abstractmethod" for d in node.decorator_list):
-                    patterns.append("abstract_class")
-                    
-        return patterns
-        
-    def _analyze_dependencies(self, tree: ast.AST) -> List[str]:
-        """Анализ зависимостей"""
-        dependencies = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                dependencies.extend(alias.name for alias in node.names)
-            elif isinstance(node, ast.ImportFrom):
-                dependencies.append(node.module)
-                
-        return dependencies
-        
-    def _find_improvements(self, file_path: Path, content: str) -> List[Dict[str, Any]]:
-        """Поиск потенциальных улучшений"""
-        improvements = []
-        
-        # Проверяем длину функций
-        tree = ast.parse(content)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                if len(node.body) > 20:
-                    improvements.append({
-                        "type": "function_length",
-                        "file": str(file_path),
-                        "line": node.lineno,
-                        "description": f"Функция {node.name} слишком длинная ({len(node.body)} строк)",
-                        "suggestion": "Разбить на более мелкие функции"
-                    })
-                    
-        # Проверяем сложность условий
-        for node in ast.walk(tree):
-            if isinstance(node, ast.If):
-                if len(node.body) > 10:
-                    improvements.append({
-                        "type": "condition_complexity",
-                        "file": str(file_path),
-                        "line": node.lineno,
-                        "description": "Сложное условие",
-                        "suggestion": "Упростить условие или разбить на части"
-                    })
-                    
-        return improvements
-        
+
+    def _merge_file_result(
+        self,
+        analysis: Dict[str, Any],
+        file_path: Path,
+        file_result: Dict[str, Any]
+    ) -> None:
+        """Добавление результата анализа файла в общий отчет"""
+        analysis["complexity"][str(file_path)] = file_result["complexity"]
+        analysis["patterns"][str(file_path)] = file_result["patterns"]
+        analysis["dependencies"][str(file_path)] = file_result["dependencies"]
+
+        # Путь мог измениться при неизменном содержимом —
+        # привязываем улучшения к текущему файлу
+        for improvement in file_result["improvements"]:
+            improvement["file"] = str(file_path)
+        analysis["potential_improvements"].extend(file_result["improvements"])
+
     async def search_code(self, query: str) -> List[Dict[str, Any]]:
         """Поиск кода по запросу"""
         results = []
-        
+
         # Поиск в локальной кодовой базе
-        for file_path in self.system_root.rglob("*.py"):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    
-                if query.lower() in content.lower():
-                    results.append({
-                        "file": str(file_path),
-                        "content": content,
-                        "type": "local"
-                    })
-                    
-            except Exception as e:
-                self.logger.error(f"Ошибка поиска в файле {file_path}: {e}")
-                
+        results.extend(await self._search_local(query))
+
         # Поиск в интернете
         try:
-            async with aiohttp.ClientSession() as session:
-                # Поиск на GitHub
-                async with session.get(
-                    f"https://api.github.com/search/code?q={query}",
-                    headers={"Accept": "application/vnd.github.v3+json"}
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        for item in data.get("items", []):
-                            results.append({
-                                "file": item["html_url"],
-                                "content": item["description"],
-                                "type": "github"
-                            })
-                            
+            results.extend(await self._search_github(query))
         except Exception as e:
             self.logger.error(f"Ошибка поиска в интернете: {e}")
-            
+
         return results
-        
+
+    async def close(self):
+        """Закрытие сетевых ресурсов"""
+        if self._github_session is not None and not self._github_session.closed:
+            await self._github_session.close()
+
+    async def _search_github(self, query: str) -> List[Dict[str, Any]]:
+        """Поиск на GitHub с условными запросами по ETag"""
+        cached = self._github_etags.get(query)
+        if cached is not None:
+            self._github_etags.move_to_end(query)
+
+        # Лимит исчерпан — до его сброса отдаем кэшированный ответ
+        if time.time() < self._rate_limit_reset:
+            return cached[1] if cached else []
+
+        if self._github_session is None or self._github_session.closed:
+            self._github_session = aiohttp.ClientSession()
+
+        headers = {"Accept": "application/vnd.github.v3+json"}
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        async with self._github_session.get(
+            f"https://api.github.com/search/code?q={query}",
+            headers=headers
+        ) as response:
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                self._rate_limit_reset = float(
+                    response.headers.get("X-RateLimit-Reset", 0)
+                )
+
+            # 304 — результат не изменился и лимит не потрачен
+            if response.status == 304 and cached:
+                return cached[1]
+
+            if response.status != 200:
+                return []
+
+            data = await response.json()
+            github_results = [
+                {
+                    "file": item["html_url"],
+                    "content": item["description"],
+                    "type": "github"
+                }
+                for item in data.get("items", [])
+            ]
+
+            etag = response.headers.get("ETag")
+            if etag:
+                self._github_etags[query] = (etag, github_results)
+                self._github_etags.move_to_end(query)
+                while len(self._github_etags) > self._github_etags_max:
+                    self._github_etags.popitem(last=False)
+
+            return github_results
+
+    async def _search_local(self, query: str) -> List[Dict[str, Any]]:
+        """Поиск по локальной кодовой базе
+
+        Сначала пробуем ripgrep (SIMD-поиск без интерпретатора);
+        при его отсутствии сканируем файлы через mmap и байтовое
+        регулярное выражение, не загружая содержимое без совпадения.
+        """
+        if shutil.which("rg"):
+            try:
+                # -F: запрос — литеральная строка, как и в mmap-фоллбэке
+                proc = await asyncio.create_subprocess_exec(
+                    "rg", "--files-with-matches", "-i", "-F", "--type", "py",
+                    query, str(self.system_root),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+                out, _ = await proc.communicate()
+                # 0 — есть совпадения, 1 — совпадений нет
+                if proc.returncode in (0, 1):
+                    return [
+                        {
+                            "file": line,
+                            "content": Path(line).read_text(encoding="utf-8"),
+                            "type": "local"
+                        }
+                        for line in out.decode().splitlines()
+                    ]
+            except OSError:
+                pass
+
+        results = []
+        pattern = re.compile(re.escape(query).encode(), re.IGNORECASE)
+        for file_path in self.system_root.rglob("*.py"):
+            try:
+                with open(file_path, "rb") as f:
+                    if os.fstat(f.fileno()).st_size == 0:
+                        continue
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if pattern.search(mm) is None:
+                            continue
+                results.append({
+                    "file": str(file_path),
+                    "content": file_path.read_text(encoding="utf-8"),
+                    "type": "local"
+                })
+            except Exception as e:
+                self.logger.error(f"Ошибка поиска в файле {file_path}: {e}")
+
+        return results
+
     def get_analysis_history(self) -> List[Dict[str, Any]]:
         """Получение истории анализа"""
-        return self.analysis_history 
\ No newline at end of file
+        return list(self.analysis_history)
\ No newline at end of file
@@ -1,10 +1,12 @@
 import asyncio
 import logging
+from collections import deque
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
-import json
+import orjson
 from pathlib import Path
+import aiofiles
 import numpy as np
 from datetime import datetime
 
@@ -32,8 +34,13 @@ class ConflictPreventionSystem:
     def __init__(self, config_path: str = "config/system_config.yaml"):
         self.logger = logging.getLogger(__name__)
         self.config_path = config_path
-        self.predictions: List[ConflictPrediction] = []
-        self.resolved_conflicts: List[Dict] = []
+        # Ограниченные истории — память процесса не растет с его возрастом
+        self.predictions = deque(maxlen=10_000)
+        self.resolved_conflicts = deque(maxlen=10_000)
+        self._pending_writes: List[Dict] = []
+        # Индекс успешно разрешённых предсказаний — проверка членства
+        # за O(1) вместо сканирования resolved_conflicts на каждый запрос
+        self._resolved_ids: set = set()
         
         # Создаем директорию для хранения предсказаний
         self.conflict_dir = Path("conflict_history")
@@ -42,28 +49,32 @@ class ConflictPreventionSystem:
     async def predict_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
         """Предсказание потенциальных конфликтов"""
         predictions = []
+
+        # Все пять проверок — чистые вычисления без I/O: прямые вызовы
+        # вместо корутин и планирования event loop
+        predictions.extend(self._predict_resource_conflicts(system_state))
+        predictions.extend(self._predict_knowledge_conflicts(system_state))
+        predictions.extend(self._predict_task_conflicts(system_state))
+        predictions.extend(self._predict_network_conflicts(system_state))
+        predictions.extend(self._predict_ethical_conflicts(system_state))
         
-        # Проверяем различные типы конфликтов
-        resource_conflicts = await self._predict_resource_conflicts(system_state)
-        knowledge_conflicts = await self._predict_knowledge_conflicts(system_state)
-        task_conflicts = await self._predict_task_conflicts(system_state)
-        network_conflicts = await self._predict_network_conflicts(system_state)
-        ethical_conflicts = await self._predict_ethical_conflicts(system_state)
-        
-        # Объединяем все предсказания
-        predictions.extend(resource_conflicts)
-        predictions.extend(knowledge_conflicts)
-        predictions.extend(task_conflicts)
-        predictions.extend(network_conflicts)
-        predictions.extend(ethical_conflicts)
-        
-        # Сохраняем предсказания
+        # Запоминаем предсказания — история строится по этому списку.
+        # Индекс разрешённых чистится при вытеснении из deque: иначе он
+        # растет без предела, а id() умершего объекта может достаться
+        # новому предсказанию и пометить его разрешённым
         for prediction in predictions:
-            await self._save_prediction(prediction)
-        
+            if len(self.predictions) == self.predictions.maxlen:
+                self._resolved_ids.discard(id(self.predictions[0]))
+            self.predictions.append(prediction)
+
+        # Сохраняем предсказания одним пакетом
+        for prediction in predictions:
+            self._save_prediction(prediction)
+        await self._flush_writes()
+
         return predictions
     
-    async def _predict_resource_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
+    def _predict_resource_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
         """Предсказание конфликтов ресурсов"""
         predictions = []
         
@@ -88,39 +99,58 @@ class ConflictPreventionSystem:
         
         return predictions
     
-    async def _predict_knowledge_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
+    def _predict_knowledge_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
         """Предсказание конфликтов знаний"""
         predictions = []
         
         # Анализируем обмен знаниями
         knowledge_exchange = system_state.get("knowledge_exchange", {})
-        
-        # Проверяем противоречия в знаниях
-        for node_id, node_knowledge in knowledge_exchange.items():
-            for other_id, other_knowledge in knowledge_exchange.items():
-                if node_id != other_id:
-                    conflict_probability = await self._calculate_knowledge_conflict(
-                        node_knowledge,
-                        other_knowledge
-                    )
-                    
-                    if conflict_probability > 0.7:
-                        predictions.append(ConflictPrediction(
-                            conflict_type=ConflictType.KNOWLEDGE,
-                            probability=conflict_probability,
-                            affected_nodes=[node_id, other_id],
-                            potential_impact={
-                                "knowledge_quality": 0.6,
-                                "learning_efficiency": 0.5,
-                                "consistency": 0.4
-                            },
-                            timestamp=datetime.now(),
-                            description=f"Потенциальный конфликт знаний между узлами {node_id} и {other_id}"
-                        ))
-        
+        if len(knowledge_exchange) < 2:
+            return predictions
+
+        # Общий словарь концептов — все векторы одной размерности
+        node_ids = list(knowledge_exchange.keys())
+        concepts = sorted({
+            concept
+            for knowledge in knowledge_exchange.values()
+            for concept in knowledge
+        })
+        if not concepts:
+            return predictions
+
+        concept_index = {concept: i for i, concept in enumerate(concepts)}
+        embeddings = np.stack([
+            self._knowledge_embedding(knowledge_exchange[node_id], concept_index)
+            for node_id in node_ids
+        ])
+
+        # Попарные конфликты одной матричной операцией вместо O(N^2)
+        # последовательных вызовов; достаточно верхнего треугольника
+        norms = np.maximum(np.linalg.norm(embeddings, axis=1), 1e-12)
+        similarity = (embeddings @ embeddings.T) / np.outer(norms, norms)
+        rows, cols = np.triu_indices(len(node_ids), k=1)
+        conflict_scores = 1.0 - similarity[rows, cols]
+        conflicting = conflict_scores > 0.7
+
+        for row, col, score in zip(
+            rows[conflicting], cols[conflicting], conflict_scores[conflicting]
+        ):
+            predictions.append(ConflictPrediction(
+                conflict_type=ConflictType.KNOWLEDGE,
+                probability=float(score),
+                affected_nodes=[node_ids[row], node_ids[col]],
+                potential_impact={
+                    "knowledge_quality": 0.6,
+                    "learning_efficiency": 0.5,
+                    "consistency": 0.4
+                },
+                timestamp=datetime.now(),
+                description=f"Потенциальный конфликт знаний между узлами {node_ids[row]} и {node_ids[col]}"
+            ))
+
         return predictions
     
-    async def _predict_task_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
+    def _predict_task_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
         """Предсказание конфликтов задач"""
         predictions = []
         
@@ -145,7 +175,7 @@ class ConflictPreventionSystem:
         
         return predictions
     
-    async def _predict_network_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
+    def _predict_network_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
         """Предсказание сетевых конфликтов"""
         predictions = []
         
@@ -170,7 +200,7 @@ class ConflictPreventionSystem:
         
         return predictions
     
-    async def _predict_ethical_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
+    def _predict_ethical_conflicts(self, system_state: Dict[str, Any]) -> List[ConflictPrediction]:
         """Предсказание этических конфликтов"""
         predictions = []
         
@@ -195,23 +225,67 @@ class ConflictPreventionSystem:
         
         return predictions
     
-    async def _calculate_knowledge_conflict(self, knowledge1: Dict, knowledge2: Dict) -> float:
-        """Расчет вероятности конфликта знаний"""
-        # TODO: Реализовать расчет конфликта знаний
-        return 0.0
+    def _knowledge_embedding(
+        self,
+        knowledge: Dict,
+        concept_index: Dict[str, int]
+    ) -> np.ndarray:
+        """Вектор знаний узла в пространстве общих концептов"""
+        embedding = np.zeros(len(concept_index))
+        for concept, value in knowledge.items():
+            index = concept_index.get(concept)
+            if index is not None:
+                embedding[index] = (
+                    float(value) if isinstance(value, (int, float)) else 1.0
+                )
+        return embedding
+
+    def _calculate_knowledge_conflict(self, knowledge1: Dict, knowledge2: Dict) -> float:
+        """Расчет вероятности конфликта знаний для пары узлов
+
+        Синхронный метод: никакого I/O здесь нет, async добавлял только
+        накладные расходы event loop.
+        """
+        concepts = sorted(set(knowledge1) | set(knowledge2))
+        if not concepts:
+            return 0.0
+
+        concept_index = {concept: i for i, concept in enumerate(concepts)}
+        first = self._knowledge_embedding(knowledge1, concept_index)
+        second = self._knowledge_embedding(knowledge2, concept_index)
+        norms = max(np.linalg.norm(first) * np.linalg.norm(second), 1e-12)
+        return float(1.0 - (first @ second) / norms)
     
-    async def _save_prediction(self, prediction: ConflictPrediction):
-        """Сохранение предсказания конфликта"""
-        prediction_file = self.conflict_dir / f"conflict_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(prediction_file, 'w') as f:
-            json.dump({
-                "conflict_type": prediction.conflict_type.value,
-                "probability": prediction.probability,
-                "affected_nodes": prediction.affected_nodes,
-                "potential_impact": prediction.potential_impact,
-                "timestamp": prediction.timestamp.isoformat(),
-                "description": prediction.description
-            }, f)
+    def _save_prediction(self, prediction: ConflictPrediction):
+        """Постановка предсказания конфликта в очередь на запись"""
+        self._pending_writes.append({
+            "conflict_type": prediction.conflict_type.value,
+            "probability": prediction.probability,
+            "affected_nodes": prediction.affected_nodes,
+            "potential_impact": prediction.potential_impact,
+            "timestamp": prediction.timestamp.isoformat(),
+            "description": prediction.description
+        })
+
+    async def _flush_writes(self):
+        """Запись накопленных предсказаний одним JSONL-файлом
+
+        Один файл на пакет вместо файла на предсказание: меньше
+        системных вызовов, event loop не блокируется, и исчезают
+        коллизии имен при секундной гранулярности временной метки.
+        """
+        if not self._pending_writes:
+            return
+
+        batch, self._pending_writes = self._pending_writes, []
+        batch_file = (
+            self.conflict_dir
+            / f"conflict_batch_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+        )
+        async with aiofiles.open(batch_file, 'ab') as f:
+            await f.write(
+                b"\n".join(orjson.dumps(record) for record in batch) + b"\n"
+            )
     
     async def resolve_conflict(self, prediction: ConflictPrediction) -> bool:
         """Разрешение конфликта"""
@@ -234,7 +308,8 @@ class ConflictPreventionSystem:
                 "resolution_timestamp": datetime.now(),
                 "success": True
             })
-            
+            self._resolved_ids.add(id(prediction))
+
             return True
             
         except Exception as e:
@@ -275,10 +350,7 @@ class ConflictPreventionSystem:
                 "affected_nodes": p.affected_nodes,
                 "timestamp": p.timestamp.isoformat(),
                 "description": p.description,
-                "resolved": any(
-                    r["prediction"] == p and r["success"]
-                    for r in self.resolved_conflicts
-                )
+                "resolved": id(p) in self._resolved_ids
             }
             for p in self.predictions
         ] 
\ No newline at end of file
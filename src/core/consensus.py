@@ -1,19 +1,29 @@
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel
+from dataclasses import dataclass, field, asdict
 import hashlib
+import orjson
 import time
 from datetime import datetime
 
-class Block(BaseModel):
-    """Блок изменений в системе"""
+@dataclass(slots=True)
+class Block:
+    """Блок изменений в системе
+
+    Обычный dataclass со слотами: блоки создаются уже провалидированными,
+    и Pydantic-валидация на каждый create_block только жгла CPU и память.
+    """
     timestamp: datetime
     node_id: str
     changes: Dict[str, Any]
     previous_hash: str
     hash: str
-    validators: List[str]
+    validators: List[str] = field(default_factory=list)
     status: str = "pending"  # pending, validated, rejected
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарное представление блока для сериализации"""
+        return asdict(self)
+
 class Consensus:
     """Система консенсуса для валидации изменений"""
     
@@ -21,6 +31,11 @@ class Consensus:
         self.min_validators = min_validators
         self.blocks: List[Block] = []
         self.validators: List[str] = []
+        # Индекс блоков по хешу — поиск за O(1) вместо сканирования цепочки
+        self._by_hash: Dict[str, Block] = {}
+        # Индексы по статусу: выборки изменений не сканируют всю цепочку
+        self._pending_blocks: List[Block] = []
+        self._validated_blocks: List[Block] = []
     
     def add_validator(self, node_id: str) -> None:
         """Добавление валидатора"""
@@ -32,10 +47,16 @@ class Consensus:
         previous_hash = self.blocks[-1].hash if self.blocks else "0" * 64
         timestamp = datetime.now()
         
-        # Создаем хеш блока
-        block_data = f"{timestamp}{node_id}{str(changes)}{previous_hash}"
-        block_hash = hashlib.sha256(block_data.encode()).hexdigest()
-        
+        # Создаем хеш блока: канонический JSON дает детерминированную
+        # сериализацию изменений и дешевле str() по всему словарю
+        block_data = b"".join([
+            timestamp.isoformat().encode(),
+            node_id.encode(),
+            orjson.dumps(changes, option=orjson.OPT_SORT_KEYS),
+            previous_hash.encode()
+        ])
+        block_hash = hashlib.sha256(block_data).hexdigest()
+
         block = Block(
             timestamp=timestamp,
             node_id=node_id,
@@ -44,44 +65,55 @@ class Consensus:
             hash=block_hash,
             validators=[]
         )
-        
+
         self.blocks.append(block)
+        self._by_hash[block_hash] = block
+        self._pending_blocks.append(block)
         return block
     
     def validate_block(self, block_hash: str, validator_id: str) -> bool:
         """Валидация блока"""
-        block = next((b for b in self.blocks if b.hash == block_hash), None)
+        block = self._by_hash.get(block_hash)
         if not block:
             return False
         
         if validator_id not in block.validators:
             block.validators.append(validator_id)
-            
-            # Если достигнуто минимальное количество валидаторов
-            if len(block.validators) >= self.min_validators:
+
+            # Если достигнуто минимальное количество валидаторов;
+            # переход делается ровно один раз — повторные голоса не
+            # должны дублировать блок в индексе валидированных
+            if (
+                block.status == "pending"
+                and len(block.validators) >= self.min_validators
+            ):
                 block.status = "validated"
+                self._pending_blocks = [
+                    b for b in self._pending_blocks if b is not block
+                ]
+                self._validated_blocks.append(block)
                 return True
-        
+
         return False
-    
+
     def get_validated_changes(self) -> List[Dict[str, Any]]:
         """Получение валидированных изменений"""
-        return [
-            block.changes 
-            for block in self.blocks 
-            if block.status == "validated"
-        ]
-    
+        return [block.changes for block in self._validated_blocks]
+
     def get_pending_changes(self) -> List[Dict[str, Any]]:
         """Получение ожидающих валидации изменений"""
-        return [
-            block.changes 
-            for block in self.blocks 
-            if block.status == "pending"
-        ]
-    
+        return [block.changes for block in self._pending_blocks]
+
     def reject_block(self, block_hash: str) -> None:
         """Отклонение блока"""
-        block = next((b for b in self.blocks if b.hash == block_hash), None)
+        block = self._by_hash.get(block_hash)
         if block:
-            block.status = "rejected" 
\ No newline at end of file
+            block.status = "rejected"
+            self._pending_blocks = [
+                b for b in self._pending_blocks if b is not block
+            ]
+            # Валидированный блок тоже можно отклонить — его изменения
+            # не должны дальше отдаваться как валидированные
+            self._validated_blocks = [
+                b for b in self._validated_blocks if b is not block
+            ]
\ No newline at end of file
@@ -1,12 +1,18 @@
 from typing import Dict, List, Any, Optional
 import logging
 from pathlib import Path
+import aiofiles
 import json
 from datetime import datetime
 import asyncio
+import hashlib
 import importlib.util
+from collections import deque
 import sys
+import time
+from typing import Tuple
 
+from .auto_scaler import load_yaml_config
 from .self_reflection import SelfReflectionSystem
 from .self_evolution import SelfEvolutionSystem
 from .auto_testing import AutoTestingSystem
@@ -36,28 +42,64 @@ class DecentralizedAISystem:
         self.total_requests = 0
         self.average_response_time = 0
         self.nodes = {}
+
+        # Кэш метрик узлов с суб-секундным TTL: под нагрузкой каждый
+        # process_message опрашивал бы все узлы заново, хотя для
+        # балансировки достаточно данных стодесятимиллисекундной давности
+        self._node_metrics_cache: Dict[str, Tuple[float, Dict]] = {}
+        self._node_metrics_ttl = 0.1
+
+        # Хеши записанного содержимого файлов: улучшения с идентичным
+        # контентом не пишутся на диск и не перезагружают модуль
+        self._file_hashes: Dict[str, bytes] = {}
         
-        # История изменений
-        self.change_history = []
+        # История изменений: ограничена, чтобы не расти бесконечно
+        self.change_history = deque(maxlen=10_000)
         
     async def start(self):
         """Запуск системы"""
         try:
             # Инициализируем LLM
             await self.llm_system.initialize()
-            
-            # Запускаем процессы самоанализа и эволюции
-            asyncio.create_task(self._run_self_reflection())
-            asyncio.create_task(self._run_evolution())
-            asyncio.create_task(self._run_auto_testing())
-            asyncio.create_task(self._run_code_analysis())
-            
+
+            # Запускаем процессы самоанализа и эволюции под надзором
+            self._supervisor_task = asyncio.create_task(self._supervise_loops())
+
             self.logger.info("Система запущена")
-            
+
         except Exception as e:
             self.logger.error(f"Ошибка запуска системы: {e}")
             raise
-            
+
+    async def _supervise_loops(self):
+        """Надзор за фоновыми циклами
+
+        TaskGroup не дает упавшему циклу тихо исчезнуть: исключение
+        отменяет остальные задачи и всплывает в лог. Фазовые сдвиги
+        разводят тяжелые конвейеры (LLM, тесты, статический анализ)
+        по времени, убирая одновременный всплеск нагрузки на старте
+        каждого цикла.
+        """
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for delay, loop_coro in (
+                    (0, self._run_self_reflection),
+                    (7, self._run_evolution),
+                    (13, self._run_auto_testing),
+                    (19, self._run_code_analysis),
+                ):
+                    tg.create_task(self._delayed(delay, loop_coro))
+        except* Exception as eg:
+            for exc in eg.exceptions:
+                self.logger.error(f"Фоновый цикл завершился с ошибкой: {exc}")
+            raise
+
+    async def _delayed(self, delay: float, loop_coro) -> None:
+        """Запуск цикла с фазовым сдвигом"""
+        await asyncio.sleep(delay)
+        await loop_coro()
+
+
     async def _run_self_reflection(self):
         """Запуск процесса самоанализа"""
         while True:
@@ -142,6 +184,8 @@ class DecentralizedAISystem:
                 
     async def _apply_improvement(self, improvement: Dict[str, Any]) -> bool:
         """Применение улучшения кода"""
+        # Одна метка времени на все записи истории этого применения
+        timestamp = datetime.now().isoformat()
         try:
             # Создаем бэкап перед изменениями
             if not await self.security_system.create_backup(improvement["changes"]):
@@ -158,18 +202,36 @@ class DecentralizedAISystem:
                 self.logger.error("Изменения не прошли валидацию")
                 return False
                 
-            # Применяем изменения
+            # Отбрасываем изменения, идентичные уже записанным:
+            # повторная запись тратила бы диск и перезагрузку модуля впустую
+            changed = {}
             for file_path, content in improvement["changes"].items():
-                with open(file_path, "w") as f:
-                    f.write(content)
-                    
-            # Перезагружаем модули
-            for file_path in improvement["changes"]:
+                digest = hashlib.blake2b(
+                    content.encode(), digest_size=16
+                ).digest()
+                if self._file_hashes.get(file_path) == digest:
+                    continue
+                changed[file_path] = (content, digest)
+
+            # Применяем изменения: запись через aiofiles не блокирует
+            # event loop, а независимые файлы пишутся параллельно
+            async def write_one(fp: str, content: str):
+                async with aiofiles.open(fp, "w") as f:
+                    await f.write(content)
+
+            await asyncio.gather(*(
+                write_one(fp, content)
+                for fp, (content, _) in changed.items()
+            ))
+
+            # Перезагружаем только реально изменившиеся модули
+            for file_path, (_, digest) in changed.items():
                 await self._reload_module(file_path)
+                self._file_hashes[file_path] = digest
                 
             # Сохраняем историю изменений
             self.change_history.append({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "improvement": improvement,
                 "status": "success"
             })
@@ -185,7 +247,7 @@ class DecentralizedAISystem:
                 await self.security_system.restore_backup(backup_path)
                 
             self.change_history.append({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "improvement": improvement,
                 "status": "error",
                 "error": str(e)
@@ -220,10 +282,25 @@ class DecentralizedAISystem:
             return current_code
         
     async def _reload_module(self, file_path: str):
-        """Перезагрузка модуля"""
+        """Перезагрузка модуля
+
+        Для модулей, уже живущих в sys.modules, importlib.reload
+        переиспользует кэшированный spec и существующий объект модуля
+        вместо полного пути spec -> module -> exec_module; вызов
+        происходит только после дедупликации по хешу содержимого,
+        так что неизмененные файлы сюда не попадают.
+        """
         try:
             module_name = Path(file_path).stem
-            if module_name in sys.modules:
+            module = sys.modules.get(module_name)
+            if module is None:
+                return
+
+            try:
+                importlib.reload(module)
+            except (ImportError, ModuleNotFoundError):
+                # Модуль без пригодного spec (загружен вручную) —
+                # возвращаемся к загрузке по пути файла
                 spec = importlib.util.spec_from_file_location(module_name, file_path)
                 module = importlib.util.module_from_spec(spec)
                 sys.modules[module_name] = module
@@ -259,12 +336,15 @@ class DecentralizedAISystem:
         return results
         
     def _load_config(self, config_path: Optional[Path] = None) -> Dict[str, Any]:
-        """Загрузка конфигурации"""
+        """Загрузка конфигурации
+
+        Конфиг — YAML, а не JSON; парсится C-загрузчиком libyaml и
+        кэшируется по mtime файла, так что горячие перезагрузки бесплатны.
+        """
         if config_path is None:
             config_path = self.system_root / "config" / "system_config.yaml"
-            
-        with open(config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+
+        return load_yaml_config(str(config_path))
             
     async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Обработка сообщения"""
@@ -275,12 +355,13 @@ class DecentralizedAISystem:
             # Обрабатываем сообщение
             response = await node.process_message(message, context)
             
-            # Обновляем метрики
+            # Обновляем метрики: инкрементальная форма среднего
+            # численно устойчива и не умножает накопленное среднее
+            # на растущий счетчик запросов
             self.total_requests += 1
-            self.average_response_time = (
-                (self.average_response_time * (self.total_requests - 1) + 
-                 response["processing_time"]) / self.total_requests
-            )
+            self.average_response_time += (
+                response["processing_time"] - self.average_response_time
+            ) / self.total_requests
             
             return response["text"]
             
@@ -290,31 +371,45 @@ class DecentralizedAISystem:
             
     async def get_available_node(self) -> Any:
         """Получение доступного узла"""
-        available_nodes = []
-        
-        # Проверяем все узлы
+        # Берем свежие метрики из кэша; устаревшие узлы опрашиваются
+        # параллельно — одна итерация event loop вместо N await
+        now = time.monotonic()
+        node_metrics: Dict[str, Dict] = {}
+        stale: List[Tuple[str, Any]] = []
         for node_id, node in self.nodes.items():
-            # Получаем метрики узла
-            metrics = await node.get_performance_metrics()
-            
-            # Проверяем доступность ресурсов
-            if (metrics["cpu_usage"] < 0.8 and 
-                metrics["memory_usage"] < 0.8 and 
-                metrics["gpu_usage"] < 0.8):
-                available_nodes.append((node, metrics))
-                
+            cached = self._node_metrics_cache.get(node_id)
+            if cached is not None and now - cached[0] < self._node_metrics_ttl:
+                node_metrics[node_id] = cached[1]
+            else:
+                stale.append((node_id, node))
+
+        if stale:
+            fresh = await asyncio.gather(
+                *(node.get_performance_metrics() for _, node in stale)
+            )
+            for (node_id, _), metrics in zip(stale, fresh):
+                self._node_metrics_cache[node_id] = (now, metrics)
+                node_metrics[node_id] = metrics
+
+        # Проверяем доступность ресурсов
+        available_nodes = [
+            (self.nodes[node_id], metrics)
+            for node_id, metrics in node_metrics.items()
+            if (metrics["cpu_usage"] < 0.8 and
+                metrics["memory_usage"] < 0.8 and
+                metrics["gpu_usage"] < 0.8)
+        ]
+
         if not available_nodes:
             raise Exception("Нет доступных узлов для обработки запроса")
-            
-        # Сортируем узлы по приоритету
-        available_nodes.sort(key=lambda x: (
-            x[1]["cpu_usage"] + 
-            x[1]["memory_usage"] + 
+
+        # Выбираем узел с наименьшей нагрузкой: min за O(N)
+        # без сортировки и промежуточного списка
+        return min(available_nodes, key=lambda x: (
+            x[1]["cpu_usage"] +
+            x[1]["memory_usage"] +
             x[1]["gpu_usage"]
-        ))
-        
-        # Выбираем узел с наименьшей нагрузкой
-        return available_nodes[0][0]
+        ))[0]
         
     def get_system_health(self) -> str:
         """Получение состояния системы"""
@@ -347,7 +442,7 @@ class DecentralizedAISystem:
         
     def get_change_history(self) -> List[Dict[str, Any]]:
         """Получение истории изменений"""
-        return self.change_history
+        return list(self.change_history)
         
     def get_security_history(self) -> List[Dict[str, Any]]:
         """Получение истории проверок безопасности"""
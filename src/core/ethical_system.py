@@ -1,9 +1,15 @@
 import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Optional, Any
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
-import json
+import numpy as np
+import orjson
+import yaml
 from pathlib import Path
 from datetime import datetime
 
@@ -31,8 +37,23 @@ class EthicalSystem:
     def __init__(self, config_path: str = "config/system_config.yaml"):
         self.logger = logging.getLogger(__name__)
         self.config_path = config_path
-        self.decisions: List[EthicalDecision] = []
-        self.violations: List[Dict] = []
+        # История решений в колоночном виде (structure-of-arrays):
+        # шесть принципов упакованы в один байт битовой маской, влияние —
+        # строка матрицы float32. Аналитика по истории сводится к
+        # векторным операциям NumPy вместо обхода объектов-датаклассов,
+        # а память на запись на порядок меньше.
+        self._history_size = 10_000
+        self._decision_count = 0
+        self._actions: Deque[str] = deque(maxlen=self._history_size)
+        self._timestamps: Deque[str] = deque(maxlen=self._history_size)
+        self._principle_masks = np.zeros(self._history_size, dtype=np.uint8)
+        self._impact_matrix = np.zeros(
+            (self._history_size, len(self._IMPACT_KEYS)), dtype=np.float32
+        )
+
+        # Ограниченная история нарушений: система работает круглосуточно,
+        # и бесконечный список утекал бы по памяти
+        self.violations: Deque[Dict] = deque(maxlen=10_000)
         self.principle_weights: Dict[EthicalPrinciple, float] = {
             principle: 1.0 for principle in EthicalPrinciple
         }
@@ -40,29 +61,124 @@ class EthicalSystem:
         # Создаем директорию для хранения этических решений
         self.ethics_dir = Path("ethics_history")
         self.ethics_dir.mkdir(exist_ok=True)
-    
+
+        # Кэш решений по (действие, контекст): эволюционные циклы
+        # повторно оценивают одни и те же действия, и кэш возвращает
+        # готовый вердикт без пересчета принципов и влияния
+        self._decision_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._decision_cache_size = 1024
+        self._decision_cache_ttl = 300.0
+
+        # Стоп-слова политики: действия с такими подстроками отклоняются
+        # до запуска дорогого асинхронного анализа
+        self._deny_patterns: frozenset = self._load_deny_patterns()
+
+        # Таблица диспетчеризации проверок: один поиск в словаре
+        # вместо цепочки сравнений enum на каждый вызов
+        self._principle_checkers = {
+            EthicalPrinciple.FREEDOM: self._check_freedom,
+            EthicalPrinciple.KNOWLEDGE: self._check_knowledge,
+            EthicalPrinciple.WISDOM: self._check_wisdom,
+            EthicalPrinciple.HARMONY: self._check_harmony,
+            EthicalPrinciple.TRANSPARENCY: self._check_transparency,
+            EthicalPrinciple.GROWTH: self._check_growth,
+        }
+
+        # Кэшированные часы: datetime.now() на каждое решение и нарушение
+        # — это syscall + форматирование; метка не старше 50 мс для
+        # аудита более чем точна. Обновляется лениво при обращении —
+        # без таймера, который будил бы простаивающий процесс
+        self._now = datetime.now()
+        self._now_refreshed_at = 0.0
+
+        # Очередь записи решений: горячий путь только кладет запись,
+        # фоновая задача сливает пачки в один NDJSON-файл за один write
+        self._decision_queue: "asyncio.Queue[Dict]" = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._writer_batch_size = 64
+
+    # Бит на принцип: шесть принципов умещаются в uint8
+    _PRINCIPLE_BITS = {
+        principle: 1 << index
+        for index, principle in enumerate(EthicalPrinciple)
+    }
+    _IMPACT_KEYS = (
+        "benefit", "harm", "autonomy", "fairness", "transparency", "privacy"
+    )
+
+    def _cached_now(self) -> datetime:
+        """Текущее время с точностью до 50 мс без syscall на каждый вызов"""
+        now = time.monotonic()
+        if now - self._now_refreshed_at >= 0.05:
+            self._now = datetime.now()
+            self._now_refreshed_at = now
+        return self._now
+
+    def _load_deny_patterns(self) -> frozenset:
+        """Загрузка стоп-слов политики из конфигурации"""
+        try:
+            with open(self.config_path, encoding="utf-8") as f:
+                config = yaml.safe_load(f) or {}
+            patterns = config.get("ethics", {}).get("deny_patterns", [])
+        except OSError:
+            patterns = []
+        return frozenset(patterns)
+
+    _CANONICAL_OPTS = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+    )
+
+    def _decision_cache_key(self, action: str, context: Dict[str, Any]) -> str:
+        """Стабильный ключ кэша по действию и каноническому контексту"""
+        payload = action.encode() + orjson.dumps(
+            context, option=self._CANONICAL_OPTS, default=str
+        )
+        return hashlib.blake2b(payload).hexdigest()
+
     async def evaluate_action(self, action: str, context: Dict[str, Any]) -> Dict:
         """Оценка действия с этической точки зрения"""
         try:
+            # Дешевый предфильтр: заведомо запрещенные действия
+            # отклоняются без шести проверок принципов и оценки влияния
+            if self._deny_patterns and any(
+                pattern in action for pattern in self._deny_patterns
+            ):
+                return {"allowed": False, "reason": "blocked_by_policy"}
+
+            key = self._decision_cache_key(action, context)
+            now = time.monotonic()
+            cached = self._decision_cache.get(key)
+            if cached is not None:
+                if now - cached[0] < self._decision_cache_ttl:
+                    self._decision_cache.move_to_end(key)
+                    return dict(cached[1])
+                del self._decision_cache[key]
+
             # Анализируем действие
             principles = await self._analyze_principles(action, context)
-            
+
             # Оцениваем влияние
             impact = await self._evaluate_impact(action, context)
-            
+
             # Принимаем решение
             decision = await self._make_decision(action, principles, impact)
-            
+
             # Сохраняем решение
             await self._save_decision(decision)
-            
-            return {
+
+            result = {
                 "allowed": self._is_action_allowed(decision),
                 "principles": [p.value for p in principles],
                 "impact": impact,
                 "justification": decision.justification
             }
-            
+
+            self._decision_cache[key] = (now, result)
+            if len(self._decision_cache) > self._decision_cache_size:
+                self._decision_cache.popitem(last=False)
+
+            return dict(result)
+
         except Exception as e:
             self.logger.error(f"Ошибка этической оценки: {e}")
             return {
@@ -70,33 +186,31 @@ class EthicalSystem:
                 "error": str(e)
             }
     
+    # Кортеж принципов один раз, чтобы не итерировать enum на каждый вызов
+    _ALL_PRINCIPLES = tuple(EthicalPrinciple)
+
     async def _analyze_principles(self, action: str, context: Dict[str, Any]) -> List[EthicalPrinciple]:
-        """Анализ этических принципов"""
-        principles = []
-        
-        # Анализируем каждый принцип
-        for principle in EthicalPrinciple:
-            if await self._check_principle(action, context, principle):
-                principles.append(principle)
-        
-        return principles
+        """Анализ этических принципов
+
+        Проверки принципов независимы, поэтому запускаются одновременно:
+        суммарная задержка равна максимальной из проверок, а не их сумме.
+        """
+        results = await asyncio.gather(*(
+            self._check_principle(action, context, principle)
+            for principle in self._ALL_PRINCIPLES
+        ))
+        return [
+            principle
+            for principle, ok in zip(self._ALL_PRINCIPLES, results)
+            if ok
+        ]
     
     async def _check_principle(self, action: str, context: Dict[str, Any], principle: EthicalPrinciple) -> bool:
         """Проверка соответствия принципу"""
-        if principle == EthicalPrinciple.FREEDOM:
-            return await self._check_freedom(action, context)
-        elif principle == EthicalPrinciple.KNOWLEDGE:
-            return await self._check_knowledge(action, context)
-        elif principle == EthicalPrinciple.WISDOM:
-            return await self._check_wisdom(action, context)
-        elif principle == EthicalPrinciple.HARMONY:
-            return await self._check_harmony(action, context)
-        elif principle == EthicalPrinciple.TRANSPARENCY:
-            return await self._check_transparency(action, context)
-        elif principle == EthicalPrinciple.GROWTH:
-            return await self._check_growth(action, context)
-        
-        return False
+        checker = self._principle_checkers.get(principle)
+        if checker is None:
+            return False
+        return await checker(action, context)
     
     async def _check_freedom(self, action: str, context: Dict[str, Any]) -> bool:
         """Проверка принципа свободы"""
@@ -153,24 +267,23 @@ class EthicalSystem:
             principles=principles,
             impact=impact,
             justification=justification,
-            timestamp=datetime.now()
+            timestamp=self._cached_now()
         )
     
     def _generate_justification(self, action: str, principles: List[EthicalPrinciple], impact: Dict[str, float]) -> str:
-        """Генерация обоснования решения"""
-        justification = f"Действие '{action}' оценивается следующим образом:\n"
-        
-        # Добавляем принципы
-        justification += "\nСоответствующие принципы:\n"
-        for principle in principles:
-            justification += f"- {principle.value}\n"
-        
-        # Добавляем влияние
-        justification += "\nВлияние:\n"
-        for key, value in impact.items():
-            justification += f"- {key}: {value:.2f}\n"
-        
-        return justification
+        """Генерация обоснования решения
+
+        Строка собирается одним join вместо цепочки += — конкатенация
+        создавала новый объект строки на каждую итерацию.
+        """
+        parts = [
+            f"Действие '{action}' оценивается следующим образом:\n"
+            "\nСоответствующие принципы:\n"
+        ]
+        parts.extend(f"- {principle.value}\n" for principle in principles)
+        parts.append("\nВлияние:\n")
+        parts.extend(f"- {key}: {value:.2f}\n" for key, value in impact.items())
+        return "".join(parts)
     
     def _is_action_allowed(self, decision: EthicalDecision) -> bool:
         """Проверка разрешения действия"""
@@ -189,41 +302,110 @@ class EthicalSystem:
         return total_benefit > total_harm
     
     async def _save_decision(self, decision: EthicalDecision):
-        """Сохранение этического решения"""
-        self.decisions.append(decision)
-        
-        # Сохраняем в файл
-        decision_file = self.ethics_dir / f"decision_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(decision_file, 'w') as f:
-            json.dump({
-                "action": decision.action,
-                "principles": [p.value for p in decision.principles],
-                "impact": decision.impact,
-                "justification": decision.justification,
-                "timestamp": decision.timestamp.isoformat()
-            }, f)
+        """Сохранение этического решения
+
+        Блокирующий open() на каждое решение убран с горячего пути:
+        запись ставится в очередь, а фоновая задача пишет пачками.
+        """
+        # Колоночная запись: кольцевая строка матриц + append в deque
+        row = self._decision_count % self._history_size
+        mask = 0
+        for principle in decision.principles:
+            mask |= self._PRINCIPLE_BITS[principle]
+        self._principle_masks[row] = mask
+        self._impact_matrix[row] = [
+            decision.impact.get(key, 0.0) for key in self._IMPACT_KEYS
+        ]
+        self._actions.append(decision.action)
+        self._timestamps.append(decision.timestamp.isoformat())
+        self._decision_count += 1
+
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._decision_writer_loop())
+
+        await self._decision_queue.put({
+            "action": decision.action,
+            "principles": [p.value for p in decision.principles],
+            "impact": decision.impact,
+            "justification": decision.justification,
+            "timestamp": decision.timestamp.isoformat()
+        })
+
+    async def _decision_writer_loop(self):
+        """Фоновый потребитель очереди решений"""
+        while True:
+            batch = [await self._decision_queue.get()]
+            while (
+                not self._decision_queue.empty()
+                and len(batch) < self._writer_batch_size
+            ):
+                batch.append(self._decision_queue.get_nowait())
+
+            try:
+                await asyncio.to_thread(self._append_batch, batch)
+            except Exception as e:
+                self.logger.error(f"Ошибка записи этических решений: {e}")
+
+    def _append_batch(self, batch: List[Dict]):
+        """Дозапись пачки решений одним вызовом write
+
+        orjson сразу отдает bytes, минуя сборку промежуточных строк.
+        """
+        decisions_file = (
+            self.ethics_dir / f"decisions-{datetime.now():%Y%m%d}.ndjson"
+        )
+        payload = b"".join(orjson.dumps(entry) + b"\n" for entry in batch)
+        with open(decisions_file, "ab") as f:
+            f.write(payload)
     
     async def report_violation(self, violation: Dict):
         """Отчет о нарушении этических принципов"""
         self.violations.append({
             **violation,
-            "timestamp": datetime.now()
+            "timestamp": self._cached_now()
         })
         
         # TODO: Реализовать обработку нарушений
     
     async def get_ethics_report(self) -> Dict:
-        """Получение отчета по этическим решениям"""
+        """Получение отчета по этическим решениям
+
+        Агрегаты считаются векторно по колоночной истории; объекты
+        решений нигде не разворачиваются.
+        """
+        retained = min(self._decision_count, self._history_size)
+
+        recent = []
+        for offset, (action, timestamp) in enumerate(
+            zip(
+                islice(self._actions, max(0, retained - 5), None),
+                islice(self._timestamps, max(0, retained - 5), None)
+            )
+        ):
+            absolute = self._decision_count - min(retained, 5) + offset
+            mask = int(self._principle_masks[absolute % self._history_size])
+            recent.append({
+                "action": action,
+                "principles": [
+                    principle.value
+                    for principle, bit in self._PRINCIPLE_BITS.items()
+                    if mask & bit
+                ],
+                "timestamp": timestamp
+            })
+
+        average_impact = (
+            dict(zip(
+                self._IMPACT_KEYS,
+                self._impact_matrix[:retained].mean(axis=0).tolist()
+            ))
+            if retained else {}
+        )
+
         return {
-            "total_decisions": len(self.decisions),
+            "total_decisions": retained,
             "total_violations": len(self.violations),
             "principle_weights": {p.value: w for p, w in self.principle_weights.items()},
-            "recent_decisions": [
-                {
-                    "action": d.action,
-                    "principles": [p.value for p in d.principles],
-                    "timestamp": d.timestamp.isoformat()
-                }
-                for d in self.decisions[-5:]
-            ]
+            "average_impact": average_impact,
+            "recent_decisions": recent
         } 
\ No newline at end of file
@@ -1,9 +1,13 @@
 import asyncio
+import heapq
+import itertools
 import logging
-from typing import Dict, List, Optional, Any
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
-import json
+import orjson
 from pathlib import Path
 import numpy as np
 from datetime import datetime
@@ -34,11 +38,39 @@ class EvolutionaryConsensus:
         self.proposals: List[ConsensusProposal] = []
         self.current_rule = ConsensusRule.EVOLUTIONARY
         self.node_reputation: Dict[str, float] = {}
-        self.rule_history: List[Dict] = []
+        # Ограниченная история правил: защищает от утечки памяти
+        # при круглосуточной работе
+        self.rule_history: Deque[Dict] = deque(maxlen=10_000)
         
         # Создаем директорию для хранения эволюционной истории
         self.history_dir = Path("evolution_history")
         self.history_dir.mkdir(exist_ok=True)
+
+        # Монотонный счетчик имен файлов: секундный strftime давал
+        # коллизии (и тихую перезапись) при субсекундной частоте записей.
+        # Стартует после максимального индекса в каталоге, чтобы рестарт
+        # процесса не начал нумерацию заново поверх старых файлов
+        self._save_seq = itertools.count(self._next_save_index())
+        self._date_cache: Tuple[float, str] = (0.0, "")
+
+    def _next_save_index(self) -> int:
+        """Первый свободный индекс файла истории в history_dir"""
+        last = -1
+        for path in self.history_dir.glob("evolution_*_*.json"):
+            try:
+                last = max(last, int(path.stem.rsplit("_", 1)[1]))
+            except ValueError:
+                continue
+        return last + 1
+
+    def _date_prefix(self) -> str:
+        """Датовый префикс имени файла, обновляемый не чаще раза в минуту"""
+        cached_at, prefix = self._date_cache
+        now = time.monotonic()
+        if not prefix or now - cached_at > 60.0:
+            prefix = time.strftime("%Y%m%d")
+            self._date_cache = (now, prefix)
+        return prefix
     
     async def propose_rule(self, proposal: ConsensusProposal) -> bool:
         """Предложение нового правила консенсуса"""
@@ -89,31 +121,26 @@ class EvolutionaryConsensus:
         return len(justification) > 100 and len(justification.split()) > 20
     
     def _update_node_reputation(self, node_id: str, fitness_score: float):
-        """Обновление репутации узла"""
-        if node_id not in self.node_reputation:
-            self.node_reputation[node_id] = 0.5
-        
-        # Обновляем репутацию на основе фитнес-скора
-        self.node_reputation[node_id] = (
-            0.7 * self.node_reputation[node_id] + 
-            0.3 * fitness_score
-        )
+        """Обновление репутации узла
+
+        Экспоненциальное сглаживание одним чтением и одной записью
+        словаря: вызывается на каждое предложение, поэтому лишние
+        проверки членства и повторные поиски ключа здесь заметны.
+        """
+        old = self.node_reputation.get(node_id, 0.5)
+        self.node_reputation[node_id] = 0.7 * old + 0.3 * fitness_score
     
     async def _check_evolution(self):
         """Проверка возможности эволюции"""
         if len(self.proposals) < 5:
             return
         
-        # Сортируем предложения по фитнес-скору
-        sorted_proposals = sorted(
-            self.proposals,
-            key=lambda x: x.fitness_score,
-            reverse=True
+        # Выбираем три лучших предложения по фитнес-скору:
+        # куча на 3 элемента вместо полной сортировки списка
+        best_proposals = heapq.nlargest(
+            3, self.proposals, key=lambda x: x.fitness_score
         )
         
-        # Выбираем лучшие предложения
-        best_proposals = sorted_proposals[:3]
-        
         # Создаем новое правило на основе лучших предложений
         new_rule = await self._create_new_rule(best_proposals)
         
@@ -127,11 +154,16 @@ class EvolutionaryConsensus:
     
     async def _create_new_rule(self, proposals: List[ConsensusProposal]) -> Dict:
         """Создание нового правила на основе лучших предложений"""
-        # Комбинируем параметры лучших предложений
-        combined_params = {}
-        for key in proposals[0].parameters.keys():
-            values = [p.parameters[key] for p in proposals]
-            combined_params[key] = np.mean(values)
+        # Комбинируем параметры лучших предложений: одна матрица
+        # (предложения x параметры) и одно векторное среднее вместо
+        # отдельного вызова np.mean на каждый ключ
+        keys = list(proposals[0].parameters.keys())
+        matrix = np.fromiter(
+            (p.parameters[k] for p in proposals for k in keys),
+            dtype=np.float64,
+            count=len(proposals) * len(keys)
+        ).reshape(len(proposals), len(keys))
+        combined_params = dict(zip(keys, matrix.mean(axis=0).tolist()))
         
         return {
             "rule_type": ConsensusRule.EVOLUTIONARY,
@@ -154,10 +186,20 @@ class EvolutionaryConsensus:
         self.proposals = []
     
     async def _save_evolution_history(self, new_rule: Dict):
-        """Сохранение истории эволюции"""
-        history_file = self.history_dir / f"evolution_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(history_file, 'w') as f:
-            json.dump(new_rule, f, default=str)
+        """Сохранение истории эволюции
+
+        Запись уходит в рабочий поток, чтобы не блокировать event loop.
+        """
+        history_file = (
+            self.history_dir
+            / f"evolution_{self._date_prefix()}_{next(self._save_seq):08d}.json"
+        )
+        await asyncio.to_thread(self._write_history_file, history_file, new_rule)
+
+    def _write_history_file(self, history_file: Path, new_rule: Dict):
+        """Синхронная запись файла истории (вызывается из потока)"""
+        with open(history_file, 'wb') as f:
+            f.write(orjson.dumps(new_rule, default=str))
     
     async def get_current_rule(self) -> Dict:
         """Получение текущего правила консенсуса"""
@@ -169,4 +211,4 @@ class EvolutionaryConsensus:
     
     async def get_evolution_history(self) -> List[Dict]:
         """Получение истории эволюции"""
-        return self.rule_history 
\ No newline at end of file
+        return list(self.rule_history) 
\ No newline at end of file
@@ -1,11 +1,15 @@
-from typing import Dict, List, Optional, Union
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, TrainingArguments, Trainer
+# Тяжелые зависимости (torch, transformers, datasets, safetensors)
+# импортируются лениво внутри методов: импорт пакета остается дешевым
+# для кода, которому узел не нужен (см. также llm_system)
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple, Union
+import functools
+import os
 from pydantic import BaseModel
-import numpy as np
 from .consensus import Consensus, Block
 import time
-from datasets import Dataset
+from datetime import datetime
 import json
 
 class GemmaNodeState(BaseModel):
@@ -29,6 +33,8 @@ class GemmaNode:
     """Узел на базе Gemma"""
     
     def __init__(self, node_id: str, position: List[float], model_name: Optional[str] = None):
+        import torch
+
         self.state = GemmaNodeState(
             id=node_id,
             position=position,
@@ -38,25 +44,81 @@ class GemmaNode:
             model_name=model_name or "google/gemma-2b"
         )
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        # Мемоизация токенизации шаблонных строк: одни и те же пары
+        # (источник, цель) повторяются в каждом историческом окне
+        self._tok_template = functools.lru_cache(maxsize=4096)(
+            self._tokenize_template
+        )
         self._initialize_model()
         self.consensus = Consensus()
         self.consensus.add_validator(node_id)
         self.state.is_validator = True
-        self.initial_weights = self._get_model_weights()
+        self._param_names = [name for name, _ in self.model.named_parameters()]
+        self._param_numels = torch.tensor(
+            [float(p.numel()) for p in self.model.parameters()]
+        )
+        self.initial_norms = self._weight_norms()
     
     def _initialize_model(self):
         """Инициализация модели и токенизатора"""
+        import torch
+        from transformers import (
+            AutoModelForCausalLM,
+            AutoTokenizer,
+            TrainingArguments
+        )
+        from transformers.utils import is_flash_attn_2_available
+
         self.tokenizer = AutoTokenizer.from_pretrained(self.state.model_name)
-        
+
+        # В распределенном запуске каждая реплика держит модель целиком
+        # на своем устройстве: DDP перекрывает all-reduce с backward и
+        # масштабируется почти линейно, тогда как авторазбивка по картам
+        # сериализует градиенты через Python
+        distributed = (
+            torch.distributed.is_available()
+            and torch.distributed.is_initialized()
+        )
+        local_rank = int(os.environ.get("LOCAL_RANK", 0))
+        device_map = {"": local_rank} if distributed else "auto"
+
+        # FlashAttention фьюзит softmax в матмул и вдвое сокращает
+        # трафик памяти внимания; sdpa — фьюзнутый фоллбэк
+        attn_impl = (
+            "flash_attention_2" if is_flash_attn_2_available() else "sdpa"
+        )
+        if torch.cuda.is_available():
+            torch.backends.cuda.enable_flash_sdp(True)
+
         self.model = AutoModelForCausalLM.from_pretrained(
             self.state.model_name,
             torch_dtype=torch.float16,
-            device_map="auto",
+            device_map=device_map,
             load_in_4bit=True,
-            use_cache=True
+            use_cache=True,
+            attn_implementation=attn_impl
         )
-        
-        # Настройка для fine-tuning
+
+        # Компиляция фьюзит ядра и убирает Python-диспетчеризацию
+        # на повторяющихся формах входа
+        try:
+            self.model = torch.compile(
+                self.model, mode="reduce-overhead", fullgraph=False
+            )
+        except Exception:
+            pass
+
+
+        # Настройка для fine-tuning; под DDP Trainer сам обернет модель
+        # и навесит DistributedSampler на датасет
+        ddp_kwargs = {}
+        if distributed:
+            ddp_kwargs = {
+                "local_rank": local_rank,
+                "ddp_backend": "nccl",
+                "ddp_find_unused_parameters": False
+            }
+
         self.training_args = TrainingArguments(
             output_dir=f"models/{self.state.id}",
             num_train_epochs=1,  # Уменьшаем для быстрого обучения
@@ -68,96 +130,116 @@ class GemmaNode:
             evaluation_strategy="epoch",
             logging_steps=10,
             warmup_steps=5,
-            max_steps=50
+            max_steps=50,
+            **ddp_kwargs
         )
     
-    def _get_model_weights(self) -> Dict[str, torch.Tensor]:
-        """Получение текущих весов модели"""
-        return {k: v.clone() for k, v in self.model.state_dict().items()}
+    def _weight_norms(self) -> torch.Tensor:
+        """L1-нормы параметров одним тензором на CPU
+
+        Снимок для оценки обучения — O(числа тензоров) скаляров вместо
+        клона всех весов (гигабайты для gemma-2b). Для валидации
+        изменений достаточно суррогата |норма после - норма до| / numel.
+        """
+        import torch
+
+        with torch.no_grad():
+            return torch.stack([
+                torch.linalg.vector_norm(p.detach(), ord=1)
+                for p in self.model.parameters()
+            ]).cpu()
+
+    def _weight_deltas(self, reference_norms: torch.Tensor) -> torch.Tensor:
+        """Суррогатные |дельты| весов на элемент относительно снимка норм"""
+        return (self._weight_norms() - reference_norms).abs_() / self._param_numels
     
+    def _tokenize_template(self, source: str, target: str) -> Tuple[tuple, tuple]:
+        """Токенизация шаблона коммуникации (кэшируется по паре узлов)
+
+        Без паддинга: выравнивание по пачке делает коллатор тренера.
+        """
+        encoded = self.tokenizer(
+            f"Узел {source} общается с узлом {target}",
+            truncation=True,
+            max_length=128
+        )
+        return tuple(encoded["input_ids"]), tuple(encoded["attention_mask"])
+
     def _prepare_training_data(self, experience: Dict[str, any]) -> Dataset:
-        """Подготовка данных для обучения"""
-        # Создаем пары вход-выход из опыта
-        examples = []
-        
-        # Добавляем текущий опыт
-        if "message" in experience:
-            examples.append({
-                "input": f"Узел {experience['source']} общается с узлом {experience['target']}",
-                "output": experience["message"]
-            })
-        
-        # Добавляем исторический опыт
-        for exp in self.state.experience[-5:]:  # Используем последние 5 опытов
-            if "message" in exp:
-                examples.append({
-                    "input": f"Узел {exp['source']} общается с узлом {exp['target']}",
-                    "output": exp["message"]
-                })
-        
-        # Создаем датасет
-        dataset = Dataset.from_list(examples)
-        
-        # Токенизируем данные
-        def tokenize_function(examples):
-            inputs = self.tokenizer(
-                examples["input"],
-                padding="max_length",
-                truncation=True,
-                max_length=128
-            )
-            outputs = self.tokenizer(
-                examples["output"],
-                padding="max_length",
-                truncation=True,
-                max_length=128
-            )
-            return {
-                "input_ids": inputs["input_ids"],
-                "attention_mask": inputs["attention_mask"],
-                "labels": outputs["input_ids"]
-            }
-        
-        return dataset.map(tokenize_function, batched=True)
+        """Подготовка данных для обучения
+
+        Шаблонные входы берутся из lru_cache, сообщения токенизируются
+        одним батчевым вызовом. Примеры остаются без паддинга —
+        выравнивание до кратной 8 длины делает коллатор на каждую
+        пачку уже в тренере. Датасет собирается напрямую через
+        from_dict без Arrow-раунда dataset.map.
+        """
+        from datasets import Dataset
+
+        input_ids: List[list] = []
+        attention_mask: List[list] = []
+        outputs: List[str] = []
+
+        # Текущий опыт и последние 5 исторических
+        for exp in [experience] + self.state.experience[-5:]:
+            if "message" not in exp:
+                continue
+            ids, mask = self._tok_template(exp["source"], exp["target"])
+            input_ids.append(list(ids))
+            attention_mask.append(list(mask))
+            outputs.append(exp["message"])
+
+        labels = self.tokenizer(
+            outputs,
+            padding=False,
+            truncation=True,
+            max_length=128
+        )["input_ids"]
+
+        return Dataset.from_dict({
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": labels
+        })
     
     def _fine_tune(self, training_data: Dataset) -> None:
         """Fine-tuning модели"""
-        # Сохраняем веса до обучения
-        pre_training_weights = self._get_model_weights()
+        from transformers import Trainer, DataCollatorForSeq2Seq
+
+        # Снимок норм весов до обучения: скаляр на тензор вместо клона весов
+        pre_training_norms = self._weight_norms()
         
-        # Создаем тренера
+        # Создаем тренера; динамический паддинг до кратной 8 длины
+        # на пачку вместо фиксированных 128 токенов — тензорные ядра
+        # fp16 работают на выровненных формах, pad-позиции не считаются
         trainer = Trainer(
             model=self.model,
             args=self.training_args,
-            train_dataset=training_data
+            train_dataset=training_data,
+            data_collator=DataCollatorForSeq2Seq(
+                self.tokenizer,
+                pad_to_multiple_of=8,
+                return_tensors="pt"
+            )
         )
         
         # Обучаем модель
         trainer.train()
         
         # Оцениваем качество обучения
-        self._evaluate_training(pre_training_weights)
+        self._evaluate_training(pre_training_norms)
     
-    def _evaluate_training(self, pre_training_weights: Dict[str, torch.Tensor]) -> None:
+    def _evaluate_training(self, pre_training_norms: torch.Tensor) -> None:
         """Оценка качества обучения"""
-        # Сравниваем веса до и после обучения
-        weight_changes = {}
-        for k in pre_training_weights:
-            current_weights = self.model.state_dict()[k]
-            weight_diff = torch.mean(torch.abs(current_weights - pre_training_weights[k]))
-            weight_changes[k] = weight_diff.item()
-        
-        # Обновляем метрики
-        self.state.performance_metrics["learning_rate"] = np.mean(list(weight_changes.values()))
+        # Сравниваем нормы весов до и после обучения
+        deltas = self._weight_deltas(pre_training_norms)
+        self.state.performance_metrics["learning_rate"] = deltas.mean().item()
     
     def _get_model_updates(self) -> Dict[str, any]:
         """Получение обновлений модели"""
-        current_weights = self._get_model_weights()
-        updates = {}
-        
-        for k in self.initial_weights:
-            updates[k] = torch.mean(torch.abs(current_weights[k] - self.initial_weights[k])).item()
-        
+        deltas = self._weight_deltas(self.initial_norms).tolist()
+        updates = dict(zip(self._param_names, deltas))
+
         return {
             "weight_updates": updates,
             "performance_metrics": self.state.performance_metrics
@@ -218,9 +300,21 @@ class GemmaNode:
     
     def process_input(self, input_text: str, max_length: int = 512) -> str:
         """Обработка текстового ввода"""
-        inputs = self.tokenizer(input_text, return_tensors="pt").to(self.device)
-        
-        with torch.no_grad():
+        import torch
+
+        inputs = self.tokenizer(input_text, return_tensors="pt")
+        if self.device.type == "cuda":
+            # Pinned-память позволяет асинхронный H2D: копия перекрывается
+            # с запуском первых ядер generate вместо блокировки на PCIe
+            inputs = {
+                k: v.pin_memory().to(self.device, non_blocking=True)
+                for k, v in inputs.items()
+            }
+        else:
+            inputs = inputs.to(self.device)
+
+        # inference_mode строже no_grad: без учета версий тензоров
+        with torch.inference_mode():
             outputs = self.model.generate(
                 **inputs,
                 max_length=max_length,
@@ -278,18 +372,59 @@ class GemmaNode:
         }
     
     def save_state(self, path: str) -> None:
-        """Сохранение состояния узла"""
-        torch.save({
-            'model_state': self.model.state_dict(),
+        """Сохранение состояния узла
+
+        Веса уходят в safetensors (по тензору, без pickle), легкое
+        состояние узла и консенсуса — в JSON-файл рядом. Загрузка
+        через mmap не читает весь чекпоинт в память разом.
+        """
+        from safetensors.torch import save_file
+
+        save_file(
+            {k: v.contiguous() for k, v in self.model.state_dict().items()},
+            f"{path}.safetensors"
+        )
+        sidecar = {
             'node_state': self.state.dict(),
-            'consensus_state': self.consensus.dict(),
+            'consensus_state': {
+                'min_validators': self.consensus.min_validators,
+                'validators': self.consensus.validators,
+                'blocks': [block.to_dict() for block in self.consensus.blocks]
+            },
             'performance_metrics': self.state.performance_metrics
-        }, path)
-    
+        }
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, default=str)
+
     def load_state(self, path: str) -> None:
         """Загрузка состояния узла"""
-        checkpoint = torch.load(path)
-        self.model.load_state_dict(checkpoint['model_state'])
+        from safetensors.torch import load_file
+
+        # assign=True подставляет mmap-тензоры на место без лишней
+        # аллокации и копии на устройстве
+        weights = load_file(f"{path}.safetensors", device=str(self.device))
+        self.model.load_state_dict(weights, assign=True)
+
+        with open(f"{path}.json", encoding="utf-8") as f:
+            checkpoint = json.load(f)
         self.state = GemmaNodeState(**checkpoint['node_state'])
-        self.consensus = Consensus(**checkpoint['consensus_state'])
-        self.state.performance_metrics = checkpoint['performance_metrics'] 
\ No newline at end of file
+
+        consensus_state = checkpoint['consensus_state']
+        self.consensus = Consensus(
+            min_validators=consensus_state['min_validators']
+        )
+        for validator in consensus_state['validators']:
+            self.consensus.add_validator(validator)
+        for block_data in consensus_state['blocks']:
+            block_data['timestamp'] = datetime.fromisoformat(
+                block_data['timestamp']
+            )
+            block = Block(**block_data)
+            self.consensus.blocks.append(block)
+            self.consensus._by_hash[block.hash] = block
+            if block.status == "pending":
+                self.consensus._pending_blocks.append(block)
+            elif block.status == "validated":
+                self.consensus._validated_blocks.append(block)
+
+        self.state.performance_metrics = checkpoint['performance_metrics']
\ No newline at end of file
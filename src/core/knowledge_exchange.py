@@ -1,16 +1,23 @@
 from typing import Dict, List, Optional, Any
-import torch
-import numpy as np
+import heapq
+import itertools
+import orjson
+import sqlite3
+import threading
+from collections import defaultdict
 from pathlib import Path
-import json
 import logging
 from datetime import datetime
 from dataclasses import dataclass
 import asyncio
 
-@dataclass
+@dataclass(slots=True)
 class Knowledge:
-    """Структура для хранения знаний"""
+    """Структура для хранения знаний
+
+    Слоты вместо __dict__: до hot_limit экземпляров на цель живут
+    в горячем кэше, компактный объект и быстрый доступ к полям.
+    """
     source_model: str
     target_model: str
     content: Dict[str, Any]
@@ -19,50 +26,93 @@ class Knowledge:
     metadata: Dict[str, Any]
 
 class KnowledgeExchange:
-    """Система обмена знаниями между моделями"""
-    
+    """Система обмена знаниями между моделями
+
+    Хранилище — SQLite в режиме WAL: вставка знания пишет одну строку
+    вместо пересериализации всего knowledge_base.json, а top-K выборки
+    выполняет индекс, а не сортировка списка в Python.
+    """
+
     def __init__(self, save_dir: str = "knowledge"):
-        self.knowledge_base: Dict[str, List[Knowledge]] = {}
         self.cross_model_connections: Dict[str, List[str]] = {}
         self.save_dir = Path(save_dir)
         self.save_dir.mkdir(parents=True, exist_ok=True)
         self.logger = logging.getLogger(__name__)
-        
-        # Загружаем существующую базу знаний
-        self._load_knowledge_base()
-    
-    def _load_knowledge_base(self):
-        """Загрузка базы знаний из файла"""
-        knowledge_file = self.save_dir / "knowledge_base.json"
-        if knowledge_file.exists():
-            with open(knowledge_file, 'r') as f:
-                data = json.load(f)
-                for model_type, knowledge_list in data.items():
-                    self.knowledge_base[model_type] = [
-                        Knowledge(**k) for k in knowledge_list
-                    ]
-    
-    def _save_knowledge_base(self):
-        """Сохранение базы знаний в файл"""
+
+        self._conn = sqlite3.connect(
+            self.save_dir / "knowledge.db",
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._db_lock = threading.Lock()
+        self._init_db()
+        self._migrate_legacy_json()
+
+        # Отложенная запись: вставки копятся в буфере и сбрасываются
+        # пачкой в рабочем потоке — хвостовая задержка share_knowledge
+        # не включает fsync диска
+        self._pending_rows: List[tuple] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_interval = 0.2
+        self._flush_threshold = 100
+
+        # Горячий кэш: min-куча по времени на цель держит новейшие
+        # записи в памяти, чтобы частые чтения не ходили в SQLite
+        self._hot_by_target: Dict[str, List[tuple]] = defaultdict(list)
+        self._hot_limit = 256
+        self._hot_seq = itertools.count()
+
+    def _init_db(self):
+        """Создание схемы хранилища знаний"""
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS knowledge (
+                id INTEGER PRIMARY KEY,
+                target TEXT NOT NULL,
+                source TEXT NOT NULL,
+                content BLOB NOT NULL,
+                ts REAL NOT NULL,
+                quality REAL NOT NULL,
+                meta BLOB NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tq
+            ON knowledge(target, quality, ts DESC)
+        """)
+
+    def _migrate_legacy_json(self):
+        """Разовый импорт старого knowledge_base.json в SQLite"""
         knowledge_file = self.save_dir / "knowledge_base.json"
-        data = {
-            model_type: [
-                {
-                    "source_model": k.source_model,
-                    "target_model": k.target_model,
-                    "content": k.content,
-                    "timestamp": k.timestamp,
-                    "quality_score": k.quality_score,
-                    "metadata": k.metadata
-                }
+        if not knowledge_file.exists():
+            return
+
+        try:
+            with open(knowledge_file, 'rb') as f:
+                data = orjson.loads(f.read())
+
+            rows = [
+                (
+                    model_type,
+                    k["source_model"],
+                    orjson.dumps(k["content"]),
+                    datetime.fromisoformat(k["timestamp"]).timestamp(),
+                    k["quality_score"],
+                    orjson.dumps(k["metadata"])
+                )
+                for model_type, knowledge_list in data.items()
                 for k in knowledge_list
             ]
-            for model_type, knowledge_list in self.knowledge_base.items()
-        }
-        
-        with open(knowledge_file, 'w') as f:
-            json.dump(data, f, indent=2)
-    
+            self._conn.executemany(
+                "INSERT INTO knowledge (target, source, content, ts, quality, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            knowledge_file.rename(knowledge_file.with_suffix(".json.imported"))
+            self.logger.info(f"Импортировано {len(rows)} знаний из JSON в SQLite")
+        except Exception as e:
+            self.logger.error(f"Ошибка миграции базы знаний: {e}")
+
     async def share_knowledge(
         self,
         source_model: str,
@@ -73,33 +123,68 @@ class KnowledgeExchange:
     ) -> None:
         """Передача знаний между моделями"""
         self.logger.info(f"Передача знаний от {source_model} к {target_model}")
-        
-        # Создаем объект знаний
-        new_knowledge = Knowledge(
-            source_model=source_model,
-            target_model=target_model,
-            content=knowledge,
-            timestamp=datetime.now().isoformat(),
-            quality_score=quality_score,
-            metadata=metadata or {}
+
+        ts = datetime.now().timestamp()
+
+        # Строка попадает в буфер; на диск уходит пачкой
+        self._pending_rows.append((
+            target_model,
+            source_model,
+            orjson.dumps(knowledge),
+            ts,
+            quality_score,
+            orjson.dumps(metadata or {})
+        ))
+
+        # Обновляем горячую кучу: корень — самая старая запись,
+        # вытесняется при переполнении
+        entry = (
+            ts,
+            next(self._hot_seq),
+            Knowledge(
+                source_model=source_model,
+                target_model=target_model,
+                content=knowledge,
+                timestamp=datetime.fromtimestamp(ts).isoformat(),
+                quality_score=quality_score,
+                metadata=metadata or {}
+            )
         )
-        
-        # Добавляем в базу знаний
-        if target_model not in self.knowledge_base:
-            self.knowledge_base[target_model] = []
-        self.knowledge_base[target_model].append(new_knowledge)
-        
+        hot = self._hot_by_target[target_model]
+        if len(hot) < self._hot_limit:
+            heapq.heappush(hot, entry)
+        else:
+            heapq.heappushpop(hot, entry)
+
+        if len(self._pending_rows) >= self._flush_threshold:
+            await asyncio.to_thread(self._flush_pending)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._debounced_flush())
+
         # Обновляем связи между моделями
         if source_model not in self.cross_model_connections:
             self.cross_model_connections[source_model] = []
         if target_model not in self.cross_model_connections[source_model]:
             self.cross_model_connections[source_model].append(target_model)
-        
-        # Сохраняем базу знаний
-        self._save_knowledge_base()
-        
+
         self.logger.info(f"Знания успешно переданы от {source_model} к {target_model}")
-    
+
+    async def _debounced_flush(self):
+        """Сброс буфера вставок не чаще раза в flush_interval"""
+        await asyncio.sleep(self._flush_interval)
+        await asyncio.to_thread(self._flush_pending)
+
+    def _flush_pending(self):
+        """Пакетная запись накопленных строк (безопасна из потока)"""
+        with self._db_lock:
+            rows, self._pending_rows = self._pending_rows, []
+            if rows:
+                self._conn.executemany(
+                    "INSERT INTO knowledge (target, source, content, ts, quality, meta) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
     async def transform_knowledge(
         self,
         source_model: str,
@@ -110,7 +195,7 @@ class KnowledgeExchange:
         # TODO: Реализовать преобразование знаний
         # Это будет зависеть от конкретных форматов моделей
         return knowledge
-    
+
     async def apply_knowledge(
         self,
         target_model: str,
@@ -120,33 +205,52 @@ class KnowledgeExchange:
         # TODO: Реализовать применение знаний
         # Это будет зависеть от конкретных моделей
         pass
-    
+
     def get_knowledge(
         self,
         model_type: str,
         min_quality: float = 0.5,
         limit: int = 10
     ) -> List[Knowledge]:
-        """Получение знаний для модели"""
-        if model_type not in self.knowledge_base:
-            return []
-        
-        # Фильтруем по качеству и сортируем по времени
-        knowledge_list = [
-            k for k in self.knowledge_base[model_type]
-            if k.quality_score >= min_quality
+        """Получение знаний для модели
+
+        Сначала пробуем горячую кучу в памяти: если там набирается
+        limit подходящих записей, они заведомо новее всего, что лежит
+        только на диске. Иначе — индекс (target, quality, ts DESC).
+        """
+        hot = self._hot_by_target.get(model_type)
+        if hot:
+            candidates = heapq.nlargest(
+                limit + len(hot),
+                (e for e in hot if e[2].quality_score >= min_quality)
+            )
+            if len(candidates) >= limit:
+                return [entry[2] for entry in candidates[:limit]]
+
+        # Читатель должен видеть еще не сброшенный буфер
+        self._flush_pending()
+        rows = self._conn.execute(
+            "SELECT source, target, content, ts, quality, meta FROM knowledge "
+            "WHERE target = ? AND quality >= ? ORDER BY ts DESC LIMIT ?",
+            (model_type, min_quality, limit)
+        ).fetchall()
+
+        return [
+            Knowledge(
+                source_model=source,
+                target_model=target,
+                content=orjson.loads(content),
+                timestamp=datetime.fromtimestamp(ts).isoformat(),
+                quality_score=quality,
+                metadata=orjson.loads(meta)
+            )
+            for source, target, content, ts, quality, meta in rows
         ]
-        knowledge_list.sort(
-            key=lambda x: x.timestamp,
-            reverse=True
-        )
-        
-        return knowledge_list[:limit]
-    
+
     def get_connected_models(self, model_type: str) -> List[str]:
         """Получение связанных моделей"""
         return self.cross_model_connections.get(model_type, [])
-    
+
     async def evaluate_knowledge_quality(
         self,
         knowledge: Knowledge
@@ -158,18 +262,23 @@ class KnowledgeExchange:
         # - Валидацию на тестовых данных
         # - Анализ производительности после применения
         return 1.0
-    
+
     async def cleanup_old_knowledge(
         self,
         max_age_days: int = 30
     ) -> None:
         """Очистка старых знаний"""
-        current_time = datetime.now()
-        
-        for model_type in list(self.knowledge_base.keys()):
-            self.knowledge_base[model_type] = [
-                k for k in self.knowledge_base[model_type]
-                if (current_time - datetime.fromisoformat(k.timestamp)).days <= max_age_days
-            ]
-        
-        self._save_knowledge_base() 
\ No newline at end of file
+        cutoff = datetime.now().timestamp() - max_age_days * 86400
+        await asyncio.to_thread(self._cleanup_sync, cutoff)
+
+    def _cleanup_sync(self, cutoff: float):
+        """Удаление устаревших строк (вызывается из потока)"""
+        self._flush_pending()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM knowledge WHERE ts < ?", (cutoff,))
+
+        # Горячие кучи не должны отдавать удаленные записи
+        for target, hot in self._hot_by_target.items():
+            fresh = [entry for entry in hot if entry[0] >= cutoff]
+            heapq.heapify(fresh)
+            self._hot_by_target[target] = fresh
@@ -1,20 +1,176 @@
-from typing import Dict, List, Any, Optional
+# torch и transformers импортируются лениво внутри методов: холодный
+# импорт пакета не тянет сотни мегабайт для кода, которому LLM не нужна
+from __future__ import annotations
+
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
 import logging
+from collections import OrderedDict
 from pathlib import Path
 import json
 from datetime import datetime
 import ast
+import functools
 import re
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
-from huggingface_hub import hf_hub_download
 import os
 import hashlib
-import pickle
+
+# blake3 (SIMD-реализация) в разы быстрее SHA-256 на типичных промптах;
+# ключ кэша — не граница безопасности, достаточно стойкости к коллизиям
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+
+def _fast_hexdigest(data: bytes) -> str:
+    """Быстрый некриптографический хеш с фоллбэком на sha256"""
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest()
+    return hashlib.sha256(data).hexdigest()
+
+
+# Извлечение код-блока из ответа модели; компилируется один раз
+_CODE_RE = re.compile(r"```python\n(.*?)\n```", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=1)
+def _code_fence_stop_class():
+    """Класс критерия остановки; создается при первом обращении,
+    потому что наследование требует уже загруженного transformers"""
+    from transformers import StoppingCriteria
+
+    class _CodeFenceStop(StoppingCriteria):
+        """Ранний выход из generate после закрывающего ```-ограждения
+
+        generate_code извлекает только первый код-блок, поэтому все шаги
+        декода после закрывающего ограждения — потерянная работа (до
+        max_length - длина кода шагов). Критерий инкрементально декодирует
+        последний токен каждой последовательности и останавливает пачку,
+        когда все ответы закрыли блок.
+        """
+
+        def __init__(self, tokenizer):
+            self._tokenizer = tokenizer
+            self._counts: Optional[List[int]] = None
+            self._tails: Optional[List[str]] = None
+
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            if self._counts is None:
+                # Первый вызов: в input_ids еще только промпт
+                self._counts = [0] * input_ids.shape[0]
+                self._tails = [""] * input_ids.shape[0]
+                return False
+
+            pieces = self._tokenizer.batch_decode(
+                input_ids[:, -1:], skip_special_tokens=True
+            )
+            done = True
+            for i, piece in enumerate(pieces):
+                if self._counts[i] >= 2:
+                    continue
+                # Хвост в 2 символа ловит ограждение, разрезанное токенами
+                window = self._tails[i] + piece
+                self._counts[i] += window.count("```")
+                self._tails[i] = window[-2:]
+                if self._counts[i] < 2:
+                    done = False
+            return done
+
+    return _CodeFenceStop
+
+
+class _ComplexityVisitor(ast.NodeVisitor):
+    """Подсчет ветвлений кода
+
+    visit_*-методы диспетчеризуются по имени класса узла через один
+    словарный lookup вместо isinstance-цепочки на каждый узел ast.walk.
+    """
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 1  # Базовая сложность
+
+    def _branch(self, node):
+        self.count += 1
+        self.generic_visit(node)
+
+    visit_If = visit_While = visit_For = _branch
+    visit_AsyncFor = visit_AsyncWith = _branch
+    visit_ExceptHandler = _branch
+
+class BatchedGenerator:
+    """Батчирующий генератор поверх model.generate
+
+    Декодирование упирается в чтение весов из памяти GPU: N
+    последовательных вызовов generate читают веса N раз. Запросы
+    складываются в очередь, фоновая задача собирает пачку (до 5 мс
+    ожидания), прогоняет один generate с паддингом и раздает результаты
+    через future — одна амортизированная прокачка весов на пачку.
+    """
+
+    def __init__(
+        self,
+        llm: "LLMSystem",
+        max_batch_size: int = 8,
+        max_wait: float = 0.005
+    ):
+        self._llm = llm
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self._worker_task: Optional[asyncio.Task] = None
+
+    async def generate(self, prompt: str) -> str:
+        """Постановка промпта в очередь и ожидание результата"""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker())
+
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def _worker(self):
+        """Сбор пачек из очереди и запуск генерации в рабочем потоке"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            prompts = [prompt for prompt, _ in batch]
+            try:
+                texts = await asyncio.to_thread(
+                    self._llm._generate_batch, prompts
+                )
+                for (_, future), text in zip(batch, texts):
+                    if not future.done():
+                        future.set_result(text)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
 
 class LLMSystem:
-    def __init__(self, system_root: Path):
+    def __init__(self, system_root: Path, quantize: bool = True):
+        import torch
+
         self.system_root = system_root
+        # INT8-веса вдвое сокращают чтение из HBM на каждом шаге декода;
+        # для редких одиночных запросов можно отключить (quantize=False)
+        self.quantize = quantize
+        self._warned_small_batch = False
         self.logger = logging.getLogger(__name__)
         self.generation_history = []
         self.model = None
@@ -25,12 +181,33 @@ class LLMSystem:
         self.cache_dir = self.system_root / "cache"
         self.model_dir.mkdir(exist_ok=True)
         self.cache_dir.mkdir(exist_ok=True)
-        self.cache = {}
+        # Кэш генераций: горячие записи в OrderedDict-LRU, холодные —
+        # по одному файлу на ключ. Промах пишет один новый файл,
+        # а не пересериализует весь кэш, как делал pickle-словарь.
+        self._mem_cache: "OrderedDict[str, str]" = OrderedDict()
         self.max_cache_size = 1000  # Максимальное количество кэшированных результатов
+        # Дайджест модели и конфигурации генерации; уточняется в initialize
+        self._config_digest = b""
         self.model_dir.mkdir(exist_ok=True)
+        # Все запросы генерации идут через общий батчирующий генератор
+        self.generator = BatchedGenerator(self)
+        # Сложность детерминирована по исходнику, а original_code
+        # повторяется между попытками улучшения — мемоизация снимает
+        # повторные разборы AST
+        self._calculate_complexity = functools.lru_cache(maxsize=1024)(
+            self._calculate_complexity
+        )
         
     async def initialize(self):
         """Инициализация LLM"""
+        import torch
+        from transformers import (
+            AutoModelForCausalLM,
+            AutoTokenizer,
+            BitsAndBytesConfig
+        )
+        from transformers.utils import is_flash_attn_2_available
+
         try:
             self.logger.info(f"Начинаем загрузку модели {self.model_name}")
             
@@ -40,17 +217,54 @@ class LLMSystem:
                 cache_dir=self.model_dir,
                 trust_remote_code=True
             )
+            # Паддинг слева обязателен для пакетной генерации
+            # decoder-only моделей
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
             self.logger.info("Токенизатор загружен")
             
-            # Загружаем модель
+            # Загружаем модель: INT8-веса вдвое уменьшают объем HBM
+            # и число байт на шаг декода; фоллбэк — fp16/fp32
+            # FlashAttention/sdpa фьюзят softmax в матмул внимания,
+            # сокращая трафик памяти — доминирующую стоимость декода
+            if torch.cuda.is_available():
+                torch.backends.cuda.enable_flash_sdp(True)
+
+            model_kwargs = {
+                "cache_dir": self.model_dir,
+                "device_map": "auto",
+                "trust_remote_code": True,
+                "attn_implementation": (
+                    "flash_attention_2"
+                    if is_flash_attn_2_available() else "sdpa"
+                )
+            }
+            if self.quantize and self.device == "cuda":
+                model_kwargs["quantization_config"] = BitsAndBytesConfig(
+                    load_in_8bit=True,
+                    llm_int8_threshold=6.0
+                )
+            else:
+                model_kwargs["torch_dtype"] = (
+                    torch.float16 if self.device == "cuda" else torch.float32
+                )
+
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.model_name,
-                cache_dir=self.model_dir,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                device_map="auto",
-                trust_remote_code=True
+                **model_kwargs
             )
             self.logger.info("Модель загружена")
+
+            # Компиляция убирает Python-диспетчеризацию и фьюзит ядра;
+            # входы паддятся до корзинных длин, чтобы кэш скомпилированных
+            # графов попадал, а не перекомпилировался на каждую длину
+            try:
+                self.model = torch.compile(
+                    self.model, mode="reduce-overhead", fullgraph=False
+                )
+            except Exception as e:
+                self.logger.warning(f"torch.compile недоступен: {e}")
             
             # Настраиваем параметры генерации
             self.generation_config = {
@@ -63,6 +277,12 @@ class LLMSystem:
                 "repetition_penalty": 1.1
             }
             
+            # Дайджест неизменной части ключа кэша считается один раз
+            self._config_digest = json.dumps(
+                {"model": self.model_name, "config": self.generation_config},
+                sort_keys=True
+            ).encode()
+
             self.logger.info("LLM успешно инициализирован")
             
         except Exception as e:
@@ -70,83 +290,154 @@ class LLMSystem:
             raise
             
     def _get_cache_key(self, prompt: str, context: Optional[Dict[str, Any]] = None) -> str:
-        """Создание ключа кэша"""
-        cache_data = {
-            "prompt": prompt,
-            "context": context,
-            "model": self.model_name,
-            "config": self.generation_config
-        }
-        return hashlib.sha256(json.dumps(cache_data, sort_keys=True).encode()).hexdigest()
+        """Создание ключа кэша
+
+        Модель и конфигурация генерации меняются только в initialize,
+        поэтому их дайджест посчитан заранее; на горячем пути
+        сериализуются и хешируются только промпт и контекст.
+        """
+        payload = json.dumps(
+            {"prompt": prompt, "context": context}, sort_keys=True
+        ).encode()
+        return _fast_hexdigest(payload + self._config_digest)
         
-    def _load_cache(self):
-        """Загрузка кэша из файла"""
+    def _cache_path(self, cache_key: str) -> Path:
+        """Путь файла кэша: двухуровневая раскладка по префиксу ключа"""
+        return self.cache_dir / cache_key[:2] / f"{cache_key}.json"
+
+    def _cache_lookup(self, cache_key: str) -> Optional[str]:
+        """Поиск в кэше: сначала память, затем файл на диске"""
+        cached = self._mem_cache.get(cache_key)
+        if cached is not None:
+            self._mem_cache.move_to_end(cache_key)
+            return cached
+
+        cache_file = self._cache_path(cache_key)
         try:
-            cache_file = self.cache_dir / "generation_cache.pkl"
             if cache_file.exists():
                 with open(cache_file, "rb") as f:
-                    self.cache = pickle.load(f)
-                self.logger.info(f"Загружен кэш с {len(self.cache)} записями")
+                    code = json.loads(f.read())["code"]
+                self._cache_remember(cache_key, code)
+                return code
         except Exception as e:
-            self.logger.error(f"Ошибка загрузки кэша: {e}")
-            
-    def _save_cache(self):
-        """Сохранение кэша в файл"""
+            self.logger.error(f"Ошибка чтения кэша {cache_file}: {e}")
+        return None
+
+    def _cache_remember(self, cache_key: str, code: str):
+        """Добавление записи в LRU-кэш в памяти с вытеснением старых"""
+        self._mem_cache[cache_key] = code
+        self._mem_cache.move_to_end(cache_key)
+        while len(self._mem_cache) > self.max_cache_size:
+            self._mem_cache.popitem(last=False)
+
+    def _cache_store(self, cache_key: str, code: str):
+        """Сохранение записи: O(1) — один новый файл, атомарная замена"""
+        self._cache_remember(cache_key, code)
         try:
-            cache_file = self.cache_dir / "generation_cache.pkl"
-            with open(cache_file, "wb") as f:
-                pickle.dump(self.cache, f)
-            self.logger.info(f"Сохранен кэш с {len(self.cache)} записями")
+            cache_file = self._cache_path(cache_key)
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(".json.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"code": code}, f)
+            os.replace(tmp_file, cache_file)
         except Exception as e:
             self.logger.error(f"Ошибка сохранения кэша: {e}")
-            
+
+
+    # Корзины длин для стабильных форм входа скомпилированной модели
+    _LENGTH_BUCKETS = (128, 256, 512, 1024, 2048)
+
+    def _bucket_length(self, longest: int) -> int:
+        """Ближайшая сверху корзинная длина для паддинга"""
+        for bucket in self._LENGTH_BUCKETS:
+            if bucket >= longest:
+                return bucket
+        return self.generation_config["max_length"]
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        """Пакетная генерация: один generate на пачку промптов
+
+        Вызывается из рабочего потока батчера, чтобы не блокировать
+        event loop на время инференса.
+        """
+        import torch
+        from transformers import StoppingCriteriaList
+
+        if (
+            self.quantize
+            and len(prompts) < 16
+            and not self._warned_small_batch
+        ):
+            # int8-ядро torch._int_mm включается с первой размерностью >= 16
+            self.logger.warning(
+                f"Пачка из {len(prompts)} промптов меньше 16: "
+                "int8-матмул работает не на полную скорость"
+            )
+            self._warned_small_batch = True
+
+        max_length = self.generation_config["max_length"]
+        lengths = self.tokenizer(
+            prompts, truncation=True, max_length=max_length
+        )["input_ids"]
+        bucket = self._bucket_length(max(len(ids) for ids in lengths))
+
+        inputs = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding="max_length",
+            truncation=True,
+            max_length=bucket
+        )
+        if self.device == "cuda":
+            # Pinned-память позволяет асинхронный H2D: копия перекрывается
+            # с запуском первых ядер generate вместо блокировки на PCIe
+            inputs = {
+                k: v.pin_memory().to(self.device, non_blocking=True)
+                for k, v in inputs.items()
+            }
+        else:
+            inputs = inputs.to(self.device)
+
+        # inference_mode строже no_grad: без учета версий тензоров
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                **inputs,
+                use_cache=True,
+                stopping_criteria=StoppingCriteriaList(
+                    [_code_fence_stop_class()(self.tokenizer)]
+                ),
+                **self.generation_config
+            )
+
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
     async def generate_code(self, prompt: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Генерация кода на основе промпта"""
         try:
             # Проверяем кэш
             cache_key = self._get_cache_key(prompt, context)
-            if cache_key in self.cache:
+            cached_code = self._cache_lookup(cache_key)
+            if cached_code is not None:
                 self.logger.info("Используем результат из кэша")
-                return self.cache[cache_key]
+                return cached_code
             
             # Форматируем промпт
             formatted_prompt = self._format_prompt(prompt, context)
-            
-            # Токенизируем входной текст
-            inputs = self.tokenizer(
-                formatted_prompt,
-                return_tensors="pt",
-                truncation=True,
-                max_length=self.generation_config["max_length"]
-            ).to(self.device)
-            
-            # Генерируем код
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    **self.generation_config
-                )
-            
-            # Декодируем результат
-            generated_code = self.tokenizer.decode(
-                outputs[0],
-                skip_special_tokens=True
-            )
-            
+
+            # Генерация через общий батчер: запрос попадает в пачку
+            # вместе с конкурентными вызовами
+            generated_code = await self.generator.generate(formatted_prompt)
+
+
             # Извлекаем только код из ответа
-            code_match = re.search(r"```python\n(.*?)\n```", generated_code, re.DOTALL)
+            code_match = _CODE_RE.search(generated_code)
             if code_match:
                 generated_code = code_match.group(1).strip()
             
-            # Сохраняем в кэш
-            if len(self.cache) >= self.max_cache_size:
-                # Удаляем старые записи
-                oldest_key = next(iter(self.cache))
-                del self.cache[oldest_key]
-            
-            self.cache[cache_key] = generated_code
-            self._save_cache()
-            
+            # Сохраняем в кэш: один файл на ключ
+            self._cache_store(cache_key, generated_code)
+
+
             # Сохраняем историю
             self.generation_history.append({
                 "timestamp": datetime.now().isoformat(),
@@ -222,12 +513,13 @@ class LLMSystem:
     def _validate_improvement(self, original_code: str, improved_code: str) -> bool:
         """Проверка улучшения кода"""
         try:
-            # Проверяем синтаксис
-            ast.parse(improved_code)
-            
+            # Проверка синтаксиса — это удачный разбор; дерево
+            # переиспользуется для расчета сложности без второго parse
+            tree = ast.parse(improved_code)
+
             # Проверяем сложность
             original_complexity = self._calculate_complexity(original_code)
-            improved_complexity = self._calculate_complexity(improved_code)
+            improved_complexity = self._complexity_from_tree(tree)
             
             if improved_complexity > original_complexity * 1.5:
                 self.logger.warning("Улучшенный код слишком сложный")
@@ -240,21 +532,18 @@ class LLMSystem:
             return False
             
     def _calculate_complexity(self, code: str) -> int:
-        """Расчет сложности кода"""
+        """Расчет сложности кода (мемоизируется в __init__)"""
         try:
-            tree = ast.parse(code)
-            complexity = 1  # Базовая сложность
-            
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.If, ast.While, ast.For, ast.AsyncFor,
-                                   ast.AsyncWith, ast.ExceptHandler)):
-                    complexity += 1
-                    
-            return complexity
-            
+            return self._complexity_from_tree(ast.parse(code))
         except Exception as e:
             self.logger.error(f"Ошибка расчета сложности: {e}")
             return 0
+
+    def _complexity_from_tree(self, tree: ast.AST) -> int:
+        """Сложность по уже разобранному дереву"""
+        visitor = _ComplexityVisitor()
+        visitor.visit(tree)
+        return visitor.count
             
     def get_generation_history(self) -> List[Dict[str, Any]]:
         """Получение истории генерации"""
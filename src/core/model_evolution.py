@@ -3,7 +3,8 @@ import logging
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
-import json
+import aiofiles
+import orjson
 from pathlib import Path
 import numpy as np
 from datetime import datetime
@@ -132,18 +133,24 @@ class ModelEvolutionSystem:
         return metrics
     
     async def _save_evolution(self, evolution: ModelEvolution):
-        """Сохранение информации об эволюции"""
+        """Сохранение информации об эволюции
+
+        orjson сериализует datetime нативно — без ручного isoformat
+        и в разы быстрее stdlib json на вложенных словарях; запись
+        через aiofiles не блокирует event loop на дисковом I/O.
+        """
         evolution_file = self.evolution_dir / f"evolution_{evolution.model_id}.json"
-        with open(evolution_file, 'w') as f:
-            json.dump({
-                "model_id": evolution.model_id,
-                "parent_model": evolution.parent_model,
-                "evolution_type": evolution.evolution_type.value,
-                "knowledge_base": evolution.knowledge_base,
-                "performance_metrics": evolution.performance_metrics,
-                "creation_timestamp": evolution.creation_timestamp.isoformat(),
-                "description": evolution.description
-            }, f)
+        payload = orjson.dumps({
+            "model_id": evolution.model_id,
+            "parent_model": evolution.parent_model,
+            "evolution_type": evolution.evolution_type.value,
+            "knowledge_base": evolution.knowledge_base,
+            "performance_metrics": evolution.performance_metrics,
+            "creation_timestamp": evolution.creation_timestamp,
+            "description": evolution.description
+        }, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY)
+        async with aiofiles.open(evolution_file, 'wb') as f:
+            await f.write(payload)
     
     async def get_evolution_history(self) -> List[Dict]:
         """Получение истории эволюции"""
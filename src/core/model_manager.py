@@ -1,6 +1,11 @@
 from typing import Dict, Optional, Union, Any
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, AutoProcessor
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    AutoProcessor,
+    GenerationConfig
+)
 from PIL import Image
 import numpy as np
 import logging
@@ -24,6 +29,12 @@ class ModelConfig:
     top_p: float
     load_in_8bit: bool
     load_in_4bit: bool
+    # Точность весов: bf16 по умолчанию — декод упирается в чтение
+    # весов, и половинная ширина без налога на деквантизацию обгоняет
+    # INT8/INT4 на CPU и некомпилированных GPU-путях
+    precision: str = "bf16"  # bf16 | fp16 | int8 | int4
+    # Выставляется менеджером после успешного torch.compile
+    compiled: bool = False
 
 class ModelManager:
     """Управление моделями в системе"""
@@ -39,6 +50,20 @@ class ModelManager:
         self.model_configs: Dict[str, ModelConfig] = {}
         self.config_path = config_path
         self.logger = logging.getLogger(__name__)
+
+        # Предсобранные конфигурации генерации и предсвязанные ссылки
+        # горячего текстового пути (см. _bind_text_fastpath)
+        self._gen_configs: Dict[str, GenerationConfig] = {}
+        self._tok_text = None
+        self._text_model = None
+        self._text_device = None
+        self._text_max_len = 0
+
+        # Батчирование текстовых запросов: конкурентные вызовы
+        # складываются в очередь и обслуживаются одним generate
+        self._text_queue: Optional[asyncio.Queue] = None
+        self._text_worker: Optional[asyncio.Task] = None
+        self._text_batch_wait = 0.01
         
         # Создаем директории для сохранения
         self.save_dir = Path("models/saved")
@@ -73,12 +98,103 @@ class ModelManager:
                 await self._load_vision_model(model_name, config)
             elif model_type == 'audio':
                 await self._load_audio_model(model_name, config)
-            
+
+            if self.models.get(model_type) is not None:
+                self._compile_model(model_type, config)
+            if model_type == 'text' and self.models['text'] is not None:
+                self._bind_text_fastpath(config)
+
             self.logger.info(f"Модель {model_name} успешно загружена")
         except Exception as e:
             self.logger.error(f"Ошибка загрузки модели {model_name}: {e}")
             raise
     
+    def _compile_model(self, model_type: str, config: ModelConfig) -> None:
+        """Компиляция горячего пути generate
+
+        reduce-overhead фьюзит ядра и захватывает CUDA-графы на
+        декодном цикле; для int8 автотюнинг GEMM дает фьюзнутый
+        int8-матмул вместо пары cast+matmul. Прогревочный generate
+        переносит стоимость компиляции с первого боевого запроса
+        на загрузку.
+        """
+        if not torch.cuda.is_available():
+            return
+        try:
+            version = tuple(
+                int(part) for part in torch.__version__.split(".")[:2]
+            )
+            if version < (2, 4):
+                return
+
+            if config.precision == "int8":
+                torch._inductor.config.max_autotune_gemm = True
+
+            self.models[model_type] = torch.compile(
+                self.models[model_type],
+                mode="reduce-overhead",
+                fullgraph=False,
+                dynamic=True
+            )
+            config.compiled = True
+
+            if model_type == 'text' and 'text' in self.tokenizers:
+                warmup = self.tokenizers['text'](
+                    "прогрев", return_tensors="pt"
+                ).to(self.models['text'].device)
+                with torch.inference_mode():
+                    self.models['text'].generate(**warmup, max_new_tokens=1)
+        except Exception as e:
+            self.logger.warning(f"torch.compile недоступен: {e}")
+
+    def _bind_text_fastpath(self, config: ModelConfig) -> None:
+        """Предсвязывание ссылок горячего текстового пути
+
+        GenerationConfig собирается один раз вместо неявной пересборки
+        из kwargs на каждый generate; токенизатор, модель и устройство
+        привязываются к атрибутам, чтобы _process_text не делал цепочку
+        словарных и атрибутных lookup'ов на каждый короткий запрос.
+        """
+        self._gen_configs['text'] = GenerationConfig(
+            max_length=config.max_length,
+            temperature=config.temperature,
+            top_p=config.top_p,
+            do_sample=True
+        )
+        self._tok_text = self.tokenizers['text']
+        # Паддинг слева обязателен для пакетной генерации
+        # decoder-only моделей
+        self._tok_text.padding_side = "left"
+        if self._tok_text.pad_token is None:
+            self._tok_text.pad_token = self._tok_text.eos_token
+        self._text_model = self.models['text']
+        self._text_device = self._text_model.device
+        self._text_max_len = config.max_length
+
+    def _precision_kwargs(self, config: ModelConfig) -> Dict[str, Any]:
+        """kwargs точности весов для from_pretrained
+
+        INT8/INT4 — явный опт-ин и только на достаточно новых GPU:
+        без фьюзии ядер деквантизация исполняется отдельным ядром
+        перед матмулом и проигрывает BF16 по скорости декода.
+        """
+        if config.precision in ("int8", "int4"):
+            if (
+                torch.cuda.is_available()
+                and torch.cuda.get_device_capability()[0] >= 8
+            ):
+                return {
+                    "load_in_8bit": config.precision == "int8",
+                    "load_in_4bit": config.precision == "int4"
+                }
+            self.logger.warning(
+                f"Точность {config.precision} недоступна на этом "
+                "оборудовании, используем bf16"
+            )
+
+        dtype = torch.float16 if config.precision == "fp16" else torch.bfloat16
+        return {"torch_dtype": dtype, "low_cpu_mem_usage": True}
+
     async def _load_text_model(self, model_name: str, config: ModelConfig) -> None:
         """Загрузка текстовой модели"""
         # Загружаем токенизатор
@@ -86,15 +202,13 @@ class ModelManager:
             model_name,
             trust_remote_code=True
         )
-        
+
         # Настройки для оптимизации памяти
         model_kwargs = {
             "device_map": "auto",
-            "load_in_8bit": config.load_in_8bit,
-            "load_in_4bit": config.load_in_4bit,
-            "torch_dtype": getattr(torch, config.dtype)
+            **self._precision_kwargs(config)
         }
-        
+
         # Загружаем модель
         self.models['text'] = AutoModelForCausalLM.from_pretrained(
             model_name,
@@ -113,11 +227,9 @@ class ModelManager:
         # Настройки для оптимизации памяти
         model_kwargs = {
             "device_map": "auto",
-            "load_in_8bit": config.load_in_8bit,
-            "load_in_4bit": config.load_in_4bit,
-            "torch_dtype": getattr(torch, config.dtype)
+            **self._precision_kwargs(config)
         }
-        
+
         # Загружаем модель
         self.models['vision'] = AutoModelForCausalLM.from_pretrained(
             model_name,
@@ -147,23 +259,71 @@ class ModelManager:
             raise
     
     async def _process_text(self, text: str) -> str:
-        """Обработка текста"""
-        inputs = self.tokenizers['text'](
-            text,
+        """Обработка текста: запрос попадает в общую пачку генерации
+
+        Декод ограничен чтением весов из памяти; пачка делит одну
+        прокачку весов между запросами (тот же прием, что батчер
+        в llm_system).
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        if self._text_worker is None or self._text_worker.done():
+            self._text_queue = asyncio.Queue()
+            self._text_worker = asyncio.create_task(self._text_batch_worker())
+
+        await self._text_queue.put((text, future))
+        return await future
+
+    async def _text_batch_worker(self):
+        """Сбор пачек запросов и одна генерация на пачку"""
+        loop = asyncio.get_running_loop()
+        batch_size = self.model_configs['text'].batch_size
+        while True:
+            batch = [await self._text_queue.get()]
+            deadline = loop.time() + self._text_batch_wait
+            while len(batch) < batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._text_queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                results = await asyncio.to_thread(
+                    self._generate_text_batch, texts
+                )
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _generate_text_batch(self, texts: list) -> list:
+        """Пакетная генерация (вызывается из рабочего потока)"""
+        inputs = self._tok_text(
+            texts,
             return_tensors="pt",
-            max_length=self.model_configs['text'].max_length,
-            truncation=True
-        ).to(self.models['text'].device)
-        
-        outputs = self.models['text'].generate(
+            padding=True,
+            truncation=True,
+            max_length=self._text_max_len
+        ).to(self._text_device, non_blocking=True)
+
+        outputs = self._text_model.generate(
             **inputs,
-            max_length=self.model_configs['text'].max_length,
-            temperature=self.model_configs['text'].temperature,
-            top_p=self.model_configs['text'].top_p,
-            do_sample=True
+            generation_config=self._gen_configs['text'],
+            use_cache=True,
+            pad_token_id=self._tok_text.pad_token_id
         )
-        
-        return self.tokenizers['text'].decode(outputs[0], skip_special_tokens=True)
+
+        return self._tok_text.batch_decode(outputs, skip_special_tokens=True)
     
     async def _process_vision(self, image: Image.Image) -> str:
         """Обработка изображения"""
@@ -216,35 +376,52 @@ class ModelManager:
         self.models[model_type] = AutoModelForCausalLM.from_pretrained(
             state_path,
             device_map="auto",
-            load_in_8bit=self.model_configs[model_type].load_in_8bit,
-            load_in_4bit=self.model_configs[model_type].load_in_4bit,
-            torch_dtype=getattr(torch, self.model_configs[model_type].dtype)
+            **self._precision_kwargs(self.model_configs[model_type])
         )
         
         # Загружаем токенизатор/процессор
         if model_type == 'text':
             self.tokenizers['text'] = AutoTokenizer.from_pretrained(state_path)
+            self._bind_text_fastpath(self.model_configs['text'])
         elif model_type == 'vision':
             self.processors['vision'] = AutoProcessor.from_pretrained(state_path)
     
     async def update_model(self, model_type: str, new_model_name: str) -> None:
-        """Обновление модели на новую версию"""
+        """Обновление модели на новую версию
+
+        Старая модель остается резидентной в памяти на время загрузки
+        новой: откат при сбое — восстановление указателей, а не запись
+        и обратное чтение гигабайт весов с диска. Чекпоинт на диск —
+        только явный save_model_state.
+        """
         self.logger.info(f"Обновление модели {model_type} на {new_model_name}")
-        
+
+        old_model = self.models.get(model_type)
+        old_tokenizer = self.tokenizers.get(model_type)
+        old_processor = self.processors.get(model_type)
+
         try:
-            # Сохраняем текущее состояние
-            current_state = await self.save_model_state(model_type)
-            
             # Загружаем новую модель
             await self.load_model(model_type, new_model_name)
-            
+
             # Обновляем конфигурацию
             self.model_configs[model_type].name = new_model_name
             self.model_configs[model_type].version = new_model_name.split('/')[-1]
-            
+
+            # Старые веса больше не нужны — освобождаем память
+            del old_model
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
             self.logger.info(f"Модель {model_type} успешно обновлена")
         except Exception as e:
             self.logger.error(f"Ошибка обновления модели: {e}")
-            # Восстанавливаем предыдущее состояние
-            await self.load_model_state(model_type, current_state)
-            raise 
\ No newline at end of file
+            # Восстанавливаем указатели на резидентную модель
+            self.models[model_type] = old_model
+            if old_tokenizer is not None:
+                self.tokenizers[model_type] = old_tokenizer
+            if old_processor is not None:
+                self.processors[model_type] = old_processor
+            if model_type == 'text' and old_model is not None:
+                self._bind_text_fastpath(self.model_configs[model_type])
+            raise
\ No newline at end of file
@@ -3,7 +3,8 @@ import logging
 from typing import Dict, Optional
 from datetime import datetime
 import aiohttp
-from huggingface_hub import HfApi
+import orjson
+from huggingface_hub import HfApi, snapshot_download
 from pathlib import Path
 import yaml
 
@@ -16,32 +17,75 @@ class ModelUpdater:
         self.logger = logging.getLogger(__name__)
         self.hf_api = HfApi()
         self.update_history: Dict[str, datetime] = {}
-    
+
+        # Кэш последних виденных ревизий (name -> sha/last_modified):
+        # переживает перезапуск, чтобы не качать модель заново, когда
+        # в хабе ничего не менялось
+        self.cache_file = Path("models/update_cache.json")
+        self._info_cache = self._load_info_cache()
+        self._pending_info: Dict[str, dict] = {}
+
+    def _load_info_cache(self) -> dict:
+        """Загрузка кэша ревизий моделей"""
+        try:
+            with open(self.cache_file, 'rb') as f:
+                return orjson.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_info_cache(self):
+        """Сохранение кэша ревизий моделей"""
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_file.write_bytes(orjson.dumps(self._info_cache))
+
     def _load_config(self) -> dict:
         """Загрузка конфигурации"""
         with open(self.config_path, 'r') as f:
             return yaml.safe_load(f)
-    
+
+    def _write_config(self):
+        """Синхронная запись конфигурации (вызывается из потока)"""
+        with open(self.config_path, 'w') as f:
+            yaml.dump(self.config, f)
+
     async def check_updates(self) -> Dict[str, bool]:
-        """Проверка наличия обновлений для моделей"""
+        """Проверка наличия обновлений для моделей
+
+        Все model_info-запросы уходят параллельно — одна RTT вместо
+        N последовательных; обновлением считается смена sha ревизии
+        относительно кэша (фиксируется после успешного update_model).
+        """
+        model_types = list(self.config)
+        infos = await asyncio.gather(
+            *[
+                asyncio.to_thread(
+                    self.hf_api.model_info,
+                    self.config[model_type]['name']
+                )
+                for model_type in model_types
+            ],
+            return_exceptions=True
+        )
+
         updates = {}
-        
-        for model_type, model_config in self.config.items():
-            try:
-                # Получаем информацию о модели
-                model_info = await self.hf_api.model_info(model_config['name'])
-                
-                # Проверяем последнее обновление
-                last_update = self.update_history.get(model_type)
-                if not last_update or model_info.last_modified > last_update:
-                    updates[model_type] = True
-                else:
-                    updates[model_type] = False
-                    
-            except Exception as e:
-                self.logger.error(f"Ошибка проверки обновлений для {model_type}: {e}")
+        for model_type, model_info in zip(model_types, infos):
+            if isinstance(model_info, Exception):
+                self.logger.error(
+                    f"Ошибка проверки обновлений для {model_type}: {model_info}"
+                )
                 updates[model_type] = False
-        
+                continue
+
+            name = self.config[model_type]['name']
+            cached = self._info_cache.get(name, {})
+            updates[model_type] = model_info.sha != cached.get("sha")
+            if updates[model_type]:
+                # Ревизия попадет в кэш только после успешной загрузки
+                self._pending_info[model_type] = {
+                    "sha": model_info.sha,
+                    "last_modified": str(model_info.last_modified)
+                }
+
         return updates
     
     async def update_model(self, model_type: str) -> bool:
@@ -60,19 +104,33 @@ class ModelUpdater:
             model_path = Path(f"models/{model_type}")
             model_path.mkdir(parents=True, exist_ok=True)
             
-            await self.hf_api.download_folder(
+            # snapshot_download качает файлы параллельно и с докачкой;
+            # allow_patterns отсекает pickle-дубликаты (*.bin) — хватает
+            # safetensors-шардов и конфигов. Блокирующий HTTP уходит
+            # в рабочий поток, event loop не простаивает на скачивании.
+            await asyncio.to_thread(
+                snapshot_download,
                 repo_id=model_name,
                 local_dir=model_path,
-                local_dir_use_symlinks=False
+                max_workers=8,
+                resume_download=True,
+                etag_timeout=30,
+                allow_patterns=["*.safetensors", "*.json", "tokenizer.*"]
             )
             
             # Обновляем конфигурацию
             model_config['version'] = datetime.now().strftime("%Y%m%d")
             self.update_history[model_type] = datetime.now()
+
+            # Фиксируем скачанную ревизию в кэше
+            pending = self._pending_info.pop(model_type, None)
+            if pending:
+                self._info_cache[model_name] = pending
+                self._save_info_cache()
             
-            # Сохраняем обновленную конфигурацию
-            with open(self.config_path, 'w') as f:
-                yaml.dump(self.config, f)
+            # Сохраняем обновленную конфигурацию; yaml.dump уходит
+            # в рабочий поток, чтобы не стопорить event loop
+            await asyncio.to_thread(self._write_config)
             
             self.logger.info(f"Модель {model_name} успешно обновлена")
             return True
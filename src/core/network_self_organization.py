@@ -1,9 +1,10 @@
+import aiofiles
 import asyncio
 import logging
-from typing import Dict, List, Optional, Set
-from dataclasses import dataclass
+import time
+from typing import Any, Dict, List, Optional, Set
 from enum import Enum
-import json
+import orjson
 from pathlib import Path
 import numpy as np
 from datetime import datetime
@@ -16,24 +17,37 @@ class NodeRole(Enum):
     RESEARCHER = "researcher"
     GUARDIAN = "guardian"
 
-@dataclass
-class NetworkMetrics:
-    """Метрики сети"""
-    latency: float
-    bandwidth: float
-    reliability: float
-    load: float
-    timestamp: datetime
+# Порядковый индекс роли для битовых операций
+_ROLE_INDEX = {role: i for i, role in enumerate(NodeRole)}
+
+# Маска совместимых ролей: проверка пары — одно битовое И вместо
+# словарного lookup'а и поиска по списку
+_COMPAT_MASK = {
+    role: sum(1 << _ROLE_INDEX[other] for other in others)
+    for role, others in {
+        NodeRole.COORDINATOR: (NodeRole.VALIDATOR, NodeRole.RESEARCHER),
+        NodeRole.VALIDATOR: (NodeRole.COORDINATOR, NodeRole.WORKER),
+        NodeRole.RESEARCHER: (NodeRole.COORDINATOR, NodeRole.GUARDIAN),
+        NodeRole.GUARDIAN: (NodeRole.RESEARCHER, NodeRole.WORKER),
+        NodeRole.WORKER: (NodeRole.VALIDATOR, NodeRole.GUARDIAN)
+    }.items()
+}
 
 class NetworkSelfOrganization:
     """Самоорганизация сети"""
-    
+
+    # Емкость кольцевого буфера метрик на узел
+    _METRICS_CAP = 4096
+
     def __init__(self, config_path: str = "config/system_config.yaml"):
         self.logger = logging.getLogger(__name__)
         self.config_path = config_path
         self.nodes: Dict[str, Dict] = {}
         self.connections: Dict[str, Set[str]] = {}
-        self.metrics: Dict[str, List[NetworkMetrics]] = {}
+        # Метрики соединений в SoA-раскладке: параллельные numpy-массивы
+        # фиксированной емкости вместо растущего списка dataclass'ов —
+        # агрегаты считаются векторно, память константная
+        self.metrics: Dict[str, Dict[str, Any]] = {}
         self.role_history: Dict[str, List[NodeRole]] = {}
         
         # Создаем директорию для хранения топологии
@@ -117,16 +131,8 @@ class NetworkSelfOrganization:
         return suitable_nodes[:3]  # Ограничиваем количество соединений
     
     def _are_roles_compatible(self, role1: NodeRole, role2: NodeRole) -> bool:
-        """Проверка совместимости ролей"""
-        compatibility_matrix = {
-            NodeRole.COORDINATOR: [NodeRole.VALIDATOR, NodeRole.RESEARCHER],
-            NodeRole.VALIDATOR: [NodeRole.COORDINATOR, NodeRole.WORKER],
-            NodeRole.RESEARCHER: [NodeRole.COORDINATOR, NodeRole.GUARDIAN],
-            NodeRole.GUARDIAN: [NodeRole.RESEARCHER, NodeRole.WORKER],
-            NodeRole.WORKER: [NodeRole.VALIDATOR, NodeRole.GUARDIAN]
-        }
-        
-        return role2 in compatibility_matrix[role1]
+        """Проверка совместимости ролей (битовая маска _COMPAT_MASK)"""
+        return bool(_COMPAT_MASK[role1] & (1 << _ROLE_INDEX[role2]))
     
     async def _create_connection(self, node1_id: str, node2_id: str):
         """Создание соединения между узлами"""
@@ -141,21 +147,49 @@ class NetworkSelfOrganization:
         # Обновляем метрики соединения
         await self._update_connection_metrics(node1_id, node2_id)
     
+    def _new_metrics_buffer(self) -> Dict[str, Any]:
+        """Пустой кольцевой буфер метрик узла"""
+        cap = self._METRICS_CAP
+        return {
+            "latency": np.zeros(cap, dtype=np.float32),
+            "bandwidth": np.zeros(cap, dtype=np.float32),
+            "reliability": np.zeros(cap, dtype=np.float32),
+            "load": np.zeros(cap, dtype=np.float32),
+            "ts": np.zeros(cap, dtype=np.float64),
+            "head": 0
+        }
+
     async def _update_connection_metrics(self, node1_id: str, node2_id: str):
         """Обновление метрик соединения"""
         # TODO: Реализовать измерение метрик
-        metrics = NetworkMetrics(
-            latency=0.1,
-            bandwidth=100.0,
-            reliability=0.95,
-            load=0.1,
-            timestamp=datetime.now()
-        )
-        
-        for node_id in [node1_id, node2_id]:
-            if node_id not in self.metrics:
-                self.metrics[node_id] = []
-            self.metrics[node_id].append(metrics)
+        now = time.time()
+
+        for node_id in (node1_id, node2_id):
+            buf = self.metrics.get(node_id)
+            if buf is None:
+                buf = self.metrics[node_id] = self._new_metrics_buffer()
+            i = buf["head"] % self._METRICS_CAP
+            buf["latency"][i] = 0.1
+            buf["bandwidth"][i] = 100.0
+            buf["reliability"][i] = 0.95
+            buf["load"][i] = 0.1
+            buf["ts"][i] = now
+            buf["head"] += 1
+
+    def get_metrics_summary(self, node_id: str) -> Dict[str, float]:
+        """Агрегаты метрик узла одним векторным проходом"""
+        buf = self.metrics.get(node_id)
+        if buf is None or buf["head"] == 0:
+            return {}
+
+        n = min(buf["head"], self._METRICS_CAP)
+        return {
+            "latency_avg": float(buf["latency"][:n].mean()),
+            "latency_p95": float(np.percentile(buf["latency"][:n], 95)),
+            "bandwidth_avg": float(buf["bandwidth"][:n].mean()),
+            "reliability_avg": float(buf["reliability"][:n].mean()),
+            "load_avg": float(buf["load"][:n].mean())
+        }
     
     async def optimize_network(self):
         """Оптимизация топологии сети"""
@@ -197,8 +231,19 @@ class NetworkSelfOrganization:
         }
     
     async def save_topology(self):
-        """Сохранение топологии сети"""
+        """Сохранение топологии сети
+
+        orjson сериализует datetime нативно и в разы быстрее stdlib
+        json на больших топологиях; default=str остается страховкой
+        для нестандартных значений. Запись через aiofiles не
+        блокирует event loop на дисковом I/O.
+        """
         topology = await self.get_network_topology()
         topology_file = self.topology_dir / f"topology_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(topology_file, 'w') as f:
-            json.dump(topology, f, default=str) 
\ No newline at end of file
+        payload = orjson.dumps(
+            topology,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY,
+            default=str
+        )
+        async with aiofiles.open(topology_file, 'wb') as f:
+            await f.write(payload) 
\ No newline at end of file
@@ -0,0 +1,25 @@
+from src.core.consensus import Consensus
+
+def test_extra_votes_do_not_duplicate_validated_block():
+    """Повторные голоса после порога не дублируют блок в валидированных"""
+    consensus = Consensus(min_validators=2)
+    block = consensus.create_block("node-1", {"change": 1})
+
+    consensus.validate_block(block.hash, "validator-1")
+    consensus.validate_block(block.hash, "validator-2")
+    consensus.validate_block(block.hash, "validator-3")
+
+    assert block.status == "validated"
+    assert consensus.get_validated_changes() == [{"change": 1}]
+
+def test_reject_validated_block_removes_its_changes():
+    """Отклонение валидированного блока убирает его из валидированных"""
+    consensus = Consensus(min_validators=1)
+    block = consensus.create_block("node-1", {"change": 1})
+    consensus.validate_block(block.hash, "validator-1")
+
+    consensus.reject_block(block.hash)
+
+    assert block.status == "rejected"
+    assert consensus.get_validated_changes() == []
+    assert consensus.get_pending_changes() == []